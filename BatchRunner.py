@@ -0,0 +1,530 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2021-04-14 14:57:35
+# @Author  : Tom Brandherm (s_brandherm19@stud.hwr-berlin.de)
+# @Link    : link
+# @Version : 1.0.0
+"""
+command line interface for running the cropper tool over many images with
+several worker processes. Every finished image is written into a manifest, so
+an interrupted run continues where it stopped.
+"""
+# =========================================================================== #
+#  Copyright 2021 Team Awesome
+# =========================================================================== #
+#  All Rights Reserved.
+#  The information contained herein is confidential property of Team Awesome.
+#  The use, copying, transfer or disclosure of such information is prohibited
+#  except by express written agreement with Team Awesome.
+# =========================================================================== #
+
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+# standard:
+import argparse
+import concurrent.futures
+import concurrent.futures.process
+import glob
+import hashlib
+import json
+import os
+
+# local:
+import CropperService
+import CropperTool
+import Metrics
+# =========================================================================== #
+#  SECTION: Global definitions
+# =========================================================================== #
+# file extensions that are collected from folders
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp',
+                    '.npy', '.raw')
+
+# name of the manifest file in the cache folder
+MANIFEST_NAME = "manifest.jsonl"
+
+# settings that change the cutouts of an image, the others (threads, the
+# remap cache folder, the value of the memory limit) only change how a run
+# is executed, so a run can be resumed with other ones
+OUTPUT_SETTINGS = ('file_format', 'columns', 'rows', 'lower_red', 'upper_red',
+                   'cut', 'encode', 'multi_board', 'rectify', 'adaptive',
+                   'remap', 'cell_size', 'raw_shape')
+
+# an image that was in a broken worker pool this often is processed alone,
+# if its worker crashes again it is recorded as crashed
+MAX_POOL_CRASHES = 2
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def collect_images(inputs:list)->list:
+    """
+    expand the given paths, folders and glob patterns into image files
+
+    Parameters
+    ----------
+    inputs : list
+        paths of images or folders and glob patterns
+
+    Returns
+    -------
+    list
+        sorted absolute paths of the found images without duplicates
+    """
+    files = set()
+    for pattern in inputs:
+        for path in glob.glob(pattern, recursive=True) or [pattern]:
+            if os.path.isdir(path):
+                for name in os.listdir(path):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        files.add(os.path.abspath(os.path.join(path, name)))
+            elif os.path.isfile(path):
+                files.add(os.path.abspath(path))
+            else:
+                print(f"skipped {path}: no such file")
+    return sorted(files)
+
+
+def settings_key(settings:dict)->str:
+    """
+    short fingerprint of the OUTPUT_SETTINGS and of the memory bounded mode.
+    Manifest entries of runs with other cutouts are not reused.
+
+    Parameters
+    ----------
+    settings : dict
+        pipeline settings
+
+    Returns
+    -------
+    str
+        hex digest of the settings
+    """
+    output = {key: str(settings.get(key)) for key in OUTPUT_SETTINGS}
+    output['max_memory'] = bool(settings.get('max_memory'))
+    text = json.dumps(output, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def file_key(path:str)->list:
+    """
+    identify a version of a file by its size and modification time
+
+    Parameters
+    ----------
+    path : str
+        path of the file
+
+    Returns
+    -------
+    list
+        [size in bytes, modification time in ns]
+    """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_manifest(manifestPath:str)->dict:
+    """
+    read the entries of an earlier run, later entries replace earlier ones
+
+    Parameters
+    ----------
+    manifestPath : str
+        path of the manifest file
+
+    Returns
+    -------
+    dict
+        key: absolute image path
+        value: manifest entry
+    """
+    entries = dict()
+    if not os.path.exists(manifestPath):
+        return entries
+    with open(manifestPath, encoding='utf-8') as manifest:
+        for line in manifest:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # last line of an interrupted run
+                continue
+            entries[entry['file']] = entry
+    return entries
+
+
+def output_folder(path:str, root:str, outputDir:str)->str:
+    """
+    folder for the cutouts of one image, the folder structure below the
+    common root of all inputs is kept to avoid name clashes
+
+    Parameters
+    ----------
+    path : str
+        absolute path of the image
+    root : str
+        common folder of all images
+    outputDir : str
+        output folder of the run
+
+    Returns
+    -------
+    str
+        absolute output folder of the image
+    """
+    relative = os.path.splitext(os.path.relpath(path, root))[0]
+    return os.path.join(os.path.abspath(outputDir), relative)
+
+
+def process_image(path:str, settings:dict)->dict:
+    """
+    run the pipeline for one image inside a worker process
+
+    Parameters
+    ----------
+    path : str
+        absolute path of the image
+    settings : dict
+        pipeline settings
+
+    Returns
+    -------
+    dict
+        result of CropperTool.seperate_the_objects
+    """
+    return CropperTool.seperate_the_objects(path, settings)
+
+
+def process_image_metrics(path:str, settings:dict)->tuple:
+    """
+    run process_image in a worker process and hand over its metrics, the
+    registry of the worker is emptied
+
+    Parameters
+    ----------
+    path : str
+        absolute path of the image
+    settings : dict
+        pipeline settings
+
+    Returns
+    -------
+    tuple
+        result of process_image, snapshot of the worker metrics
+    """
+    result = process_image(path, settings)
+    return result, Metrics.get_registry().snapshot(reset=True)
+
+
+def init_worker():
+    # the images are already processed in parallel, more threads per
+    # process would only compete for the same cores
+    CropperTool.cv2.setNumThreads(1)
+    # forked workers inherit the counters of the main process
+    Metrics.get_registry().snapshot(reset=True)
+
+
+def crashed_result(path:str)->dict:
+    """result of an image whose worker process crashed, e.g. killed by the
+    out of memory killer. Crashed images are processed again by the next
+    run."""
+    Metrics.inc('images_total', status='crashed')
+    return {'file': path, 'status': 'crashed', 'quality': None, 'cutouts': [],
+            'error': "worker process crashed", 'time': 0.0}
+
+
+def run_pool(jobs:list, workers:int, record)->list:
+    """
+    process the jobs in a pool of worker processes
+
+    Parameters
+    ----------
+    jobs : list
+        (path, settings) of the images
+    workers : int
+        number of worker processes
+    record : callable
+        called with the path and the result of every finished image
+
+    Returns
+    -------
+    list
+        jobs that were not finished because a worker process crashed and
+        broke the pool
+    """
+    unfinished = list()
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=init_worker) as executor:
+        futures = {executor.submit(process_image_metrics, path, imageSettings):
+                   (path, imageSettings) for path, imageSettings in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future][0]
+            try:
+                result, metrics = future.result()
+                Metrics.get_registry().merge(metrics)
+            except concurrent.futures.process.BrokenProcessPool:
+                # not the fault of this image in most cases, retried
+                unfinished.append(futures[future])
+                continue
+            except Exception as e:
+                result = {'file': path, 'status': 'error', 'quality': None,
+                          'cutouts': [], 'error': str(e), 'time': 0.0}
+                Metrics.inc('images_total', status='error')
+                Metrics.inc('stage_failures_total', stage='worker')
+            record(path, result)
+    if unfinished:
+        Metrics.inc('stage_failures_total', stage='pool')
+    return unfinished
+
+
+def run_batch(files:list, settings:dict, outputDir:str, cacheDir:str,
+              workers:int=1, retryErrors:bool=False, force:bool=False,
+              metricsPath:str=None)->list:
+    """
+    process all images and record every result in the manifest. Images that
+    are already in the manifest with the same file version and settings
+    are skipped, except crashed ones.
+
+    A crashed worker process breaks the whole pool. The pool is started
+    again with the unfinished images, images that were in MAX_POOL_CRASHES
+    broken pools are then processed one by one, so only the image that
+    kills its worker is recorded as crashed.
+
+    Parameters
+    ----------
+    files : list
+        absolute paths of the images
+    settings : dict
+        pipeline settings without the output folder
+    outputDir : str
+        output folder of the run
+    cacheDir : str
+        folder of the manifest
+    workers : int, optional
+        number of worker processes, by default 1
+    retryErrors : bool, optional
+        process images again that failed with an error, by default False
+    force : bool, optional
+        ignore the manifest and process every image, by default False
+    metricsPath : str, optional
+        file for the metrics of the run (Metrics.FileExporter), written
+        during the run and at its end, by default None
+
+    Returns
+    -------
+    list
+        results of the processed images
+    """
+    os.makedirs(cacheDir, exist_ok=True)
+    manifestPath = os.path.join(cacheDir, MANIFEST_NAME)
+    done = dict() if force else load_manifest(manifestPath)
+    key = settings_key(settings)
+    root = os.path.commonpath([os.path.dirname(f) for f in files]) if files else ''
+    jobs = list()
+    for path in files:
+        entry = done.get(path)
+        if entry is not None and entry['settings'] == key \
+                and entry['version'] == file_key(path) \
+                and entry['status'] != 'crashed' \
+                and (entry['status'] != 'error' or not retryErrors):
+            Metrics.inc('cache_hits_total', cache='manifest')
+            continue
+        Metrics.inc('cache_misses_total', cache='manifest')
+        imageSettings = dict(settings)
+        imageSettings['output_dir'] = output_folder(path, root, outputDir)
+        jobs.append((path, imageSettings))
+    print(f"{len(files)-len(jobs)} of {len(files)} images already done")
+
+    results = list()
+    exporter = Metrics.FileExporter(metricsPath) if metricsPath else None
+    with open(manifestPath, 'a', encoding='utf-8') as manifest:
+        def record(path, result):
+            result['version'] = file_key(path)
+            result['settings'] = key
+            manifest.write(json.dumps(result) + '\n')
+            manifest.flush()
+            results.append(result)
+            print(f"[{len(results)}/{len(jobs)}] {result['status']}: {path}")
+            if exporter is not None:
+                exporter.export()
+
+        if workers <= 1:
+            for path, imageSettings in jobs:
+                record(path, process_image(path, imageSettings))
+        else:
+            pending, crashes = jobs, dict()
+            while pending:
+                shared = [job for job in pending
+                          if crashes.get(job[0], 0) < MAX_POOL_CRASHES]
+                alone = [job for job in pending
+                         if crashes.get(job[0], 0) >= MAX_POOL_CRASHES]
+                pending = run_pool(shared, workers, record) if shared else []
+                for path, imageSettings in pending:
+                    crashes[path] = crashes.get(path, 0) + 1
+                for path, imageSettings in alone:
+                    if run_pool([(path, imageSettings)], 1, record):
+                        record(path, crashed_result(path))
+    if exporter is not None:
+        exporter.export(force=True)
+    return results
+
+
+def parse_arguments(argv:list=None)->argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="crop the rectangles of game board images into single images")
+    parser.add_argument(
+        'inputs', nargs='*', default=[CropperTool.FILENAME],
+        help="image files, folders or glob patterns")
+    parser.add_argument(
+        '-o', '--output', default='cutouts',
+        help="output folder of the cutouts (default: %(default)s)")
+    parser.add_argument(
+        '-j', '--workers', type=int, default=os.cpu_count() or 1,
+        help="number of worker processes (default: %(default)s)")
+    parser.add_argument(
+        '--grid', default=f"{CropperTool.DEFAULT_SETTINGS['columns']}x"
+                          f"{CropperTool.DEFAULT_SETTINGS['rows']}",
+        help="rectangles on the game board as COLUMNSxROWS (default: %(default)s)")
+    parser.add_argument(
+        '--lower-red', type=int, nargs=3, metavar=('H', 'S', 'V'),
+        default=[int(v) for v in CropperTool.LOWER_RED],
+        help="lower HSV limit of the red dots (default: %(default)s)")
+    parser.add_argument(
+        '--upper-red', type=int, nargs=3, metavar=('H', 'S', 'V'),
+        default=[int(v) for v in CropperTool.UPPER_RED],
+        help="upper HSV limit of the red dots (default: %(default)s)")
+    parser.add_argument(
+        '--cache', default=None,
+        help="folder of the manifest (default: OUTPUT/.cache)")
+    parser.add_argument(
+        '--format', default='jpg', choices=['jpg', 'png', 'bmp', 'tif', 'webp'],
+        help="file format of the cutouts (default: %(default)s)")
+    parser.add_argument(
+        '--multi-board', action='store_true',
+        help="crop every game board of a photo, not only the largest one")
+    parser.add_argument(
+        '--threads', type=int, default=None,
+        help="threads per image for the boards of one photo "
+             "(default: all cores with -j 1, else 1)")
+    parser.add_argument(
+        '--cell-threads', type=int, default=1,
+        help="threads that cut and encode the cells of one board, "
+             "0 for all cores (default: %(default)s)")
+    parser.add_argument(
+        '--cv2-threads', type=int, default=None,
+        help="threads inside of cv2 (default: cv2 default, 1 with -j > 1)")
+    parser.add_argument(
+        '--rectify', action='store_true',
+        help="warp every cell to an upright rectangle")
+    parser.add_argument(
+        '--adaptive', action='store_true',
+        help="estimate the red hues per image and find subpixel dot centers")
+    parser.add_argument(
+        '--remap', action='store_true',
+        help="cut all cells of a board with one cached remap table from the "
+             "unresized image, upright and equally sized")
+    parser.add_argument(
+        '--cell-size', default=None, metavar='WxH',
+        help="size of the remapped cells (default: median cell size)")
+    parser.add_argument(
+        '--max-memory', type=float, default=None, metavar='MB',
+        help="find the board on a downscaled copy and read only the tiles "
+             "of the cells from the full resolution .npy or .raw image, MB "
+             "for the copy and the strips or tiles read at once (default: "
+             "read the whole image)")
+    parser.add_argument(
+        '--raw-shape', default=None, metavar='HxW',
+        help="height and width of .raw input files with 8 bit BGR pixels")
+    parser.add_argument(
+        '--retry-errors', action='store_true',
+        help="process images again that failed in an earlier run")
+    parser.add_argument(
+        '--force', action='store_true',
+        help="ignore the manifest and process every image")
+    parser.add_argument(
+        '--metrics', default=None, metavar='PATH',
+        help="write counters and latency histograms into this file, JSON "
+             "for .json, else Prometheus text")
+    parser.add_argument(
+        '--serve', action='store_true',
+        help="keep running and answer JSON requests line by line on "
+             "stdin/stdout, see CropperService")
+    return parser.parse_args(argv)
+
+
+def main(argv:list=None)->list:
+    """
+    command line entry point, see --help
+
+    Parameters
+    ----------
+    argv : list, optional
+        command line arguments, by default sys.argv
+
+    Returns
+    -------
+    list
+        results of the processed images
+    """
+    args = parse_arguments(argv)
+    if args.serve:
+        CropperService.serve(metricsPath=args.metrics)
+        return []
+    try:
+        columns, rows = (int(n) for n in args.grid.lower().split('x'))
+    except ValueError:
+        raise SystemExit(f"invalid grid {args.grid}, expected COLUMNSxROWS")
+    cellSize = None
+    if args.cell_size is not None:
+        try:
+            width, height = (int(n) for n in args.cell_size.lower().split('x'))
+        except ValueError:
+            raise SystemExit(f"invalid cell size {args.cell_size}, expected WxH")
+        cellSize = (width, height)
+    rawShape = None
+    if args.raw_shape is not None:
+        try:
+            height, width = (int(n) for n in args.raw_shape.lower().split('x'))
+        except ValueError:
+            raise SystemExit(f"invalid raw shape {args.raw_shape}, expected HxW")
+        rawShape = (height, width)
+    settings = dict(CropperTool.DEFAULT_SETTINGS)
+    settings.update({
+        'file_format': args.format,
+        'columns': columns,
+        'rows': rows,
+        'lower_red': CropperTool.np.array(args.lower_red),
+        'upper_red': CropperTool.np.array(args.upper_red),
+        'multi_board': args.multi_board,
+        # the worker processes already use all cores
+        'threads': args.threads or (None if args.workers <= 1 else 1),
+        'cell_threads': args.cell_threads or None,
+        'cv2_threads': args.cv2_threads,
+        'rectify': args.rectify,
+        'adaptive': args.adaptive,
+        'remap': args.remap,
+        'cell_size': cellSize,
+        'max_memory': args.max_memory,
+        'raw_shape': rawShape,
+    })
+    del settings['output_dir']
+    inputs = args.inputs
+    if inputs == [CropperTool.FILENAME]:
+        # the default file name is relative to the script
+        inputs = [os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               CropperTool.FILENAME)]
+    files = collect_images(inputs)
+    cacheDir = args.cache or os.path.join(args.output, '.cache')
+    if args.remap:
+        # the remap tables are reused by the next images of a fixed rig
+        settings['remap_cache'] = os.path.abspath(os.path.join(cacheDir, 'remap'))
+    return run_batch(files, settings, args.output, cacheDir, args.workers,
+                     args.retry_errors, args.force, args.metrics)
+
+# =========================================================================== #
+#  SECTION: Main Body
+# =========================================================================== #
+
+if __name__ == '__main__':
+    main()
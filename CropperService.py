@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2021-04-14 14:57:35
+# @Author  : Tom Brandherm (s_brandherm19@stud.hwr-berlin.de)
+# @Link    : link
+# @Version : 1.0.0
+"""
+long-lived worker that keeps the cropper pipeline loaded and answers
+JSON requests line by line on stdin/stdout
+"""
+# =========================================================================== #
+#  Copyright 2021 Team Awesome
+# =========================================================================== #
+#  All Rights Reserved.
+#  The information contained herein is confidential property of Team Awesome.
+#  The use, copying, transfer or disclosure of such information is prohibited
+#  except by express written agreement with Team Awesome.
+# =========================================================================== #
+
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+# standard:
+import base64
+import contextlib
+import json
+import sys
+import time
+
+# local:
+import CropperTool
+import Metrics
+# =========================================================================== #
+#  SECTION: Global definitions
+# =========================================================================== #
+# settings that can be changed by a request
+REQUEST_SETTINGS = ('columns', 'rows', 'lower_red', 'upper_red', 'output_dir',
+                    'file_format', 'multi_board', 'rectify', 'remap',
+                    'cell_size', 'adaptive')
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def decode_request_image(request:dict):
+    """
+    load the image of a request, either from the path or from the base64
+    encoded file content
+
+    Parameters
+    ----------
+    request : dict
+        request with the key 'path' or 'image'
+
+    Returns
+    -------
+    np.array
+        image, None if it can not be decoded
+    """
+    if 'image' in request:
+        return CropperTool.decode_image(base64.b64decode(request['image']))
+    return CropperTool.read_mapped_image(request['path'])
+
+
+def handle_request(request:dict)->dict:
+    """
+    run the pipeline for one request
+
+    request keys:
+        id: optional, copied into the response
+        path or image: path of the image or base64 encoded image file
+        return: 'metadata' (default) or 'cutouts' for base64 encoded cutouts
+        settings: optional values of DEFAULT_SETTINGS, if output_dir is set
+        the cutouts are saved and their paths are returned
+
+    Parameters
+    ----------
+    request : dict
+        decoded request
+
+    Returns
+    -------
+    dict
+        result of CropperTool.seperate_image plus the id of the request
+    """
+    begin = time.time()
+    settings = dict()
+    if not isinstance(request.get('settings', {}), dict):
+        raise ValueError("settings must be a JSON object")
+    for key, value in request.get('settings', {}).items():
+        if key not in REQUEST_SETTINGS:
+            raise ValueError(f"unknown setting {key}")
+        if key in ('lower_red', 'upper_red'):
+            value = CropperTool.np.array(value)
+        settings[key] = value
+    settings.setdefault('output_dir', None)
+    returnCutouts = request.get('return', 'metadata') == 'cutouts'
+    # without an output folder the pixels are only needed for the response
+    settings['cut'] = returnCutouts or settings['output_dir'] is not None
+    # the cells are encoded on the cell threads of the pipeline
+    settings['encode'] = True
+
+    img = decode_request_image(request)
+    result = CropperTool.seperate_image(img, settings, request.get('path'))
+    if settings['output_dir'] is None:
+        for board in [result] + result.get('boards', []):
+            board['cutouts'] = [base64.b64encode(cutout).decode('ascii')
+                                for cutout in board['cutouts']]
+    result['id'] = request.get('id')
+    result['time'] = float(time.time()-begin)
+    return result
+
+
+def warm_up():
+    """run the pipeline once, so the first request does not pay for the
+    initialisation of cv2"""
+    img = CropperTool.np.full((100, 150, 3), 255, CropperTool.np.uint8)
+    CropperTool.seperate_image(img, {'output_dir': None})
+
+
+def serve(instream=None, outstream=None, metricsPath:str=None):
+    """
+    answer requests until the input stream is closed. Every line of the
+    input is one JSON request, every line of the output is the JSON response.
+    Messages of the pipeline are written to stderr. The request
+    {"metrics": true} is answered with Metrics.Registry.snapshot.
+
+    Parameters
+    ----------
+    instream : file, optional
+        request stream, by default sys.stdin
+    outstream : file, optional
+        response stream, by default sys.stdout
+    metricsPath : str, optional
+        file for the metrics (Metrics.FileExporter), by default None
+    """
+    instream = instream or sys.stdin
+    outstream = outstream or sys.stdout
+    exporter = Metrics.FileExporter(metricsPath) if metricsPath else None
+    with contextlib.redirect_stdout(sys.stderr):
+        warm_up()
+    # the warm up is no real request
+    Metrics.get_registry().snapshot(reset=True)
+    for line in instream:
+        if not line.strip():
+            continue
+        request = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("the request must be a JSON object")
+            if request.get('metrics'):
+                response = Metrics.get_registry().snapshot()
+            else:
+                with contextlib.redirect_stdout(sys.stderr):
+                    response = handle_request(request)
+        except Exception as e:
+            Metrics.inc('requests_failed_total')
+            response = {'id': request.get('id') if isinstance(request, dict)
+                        else None, 'status': 'error', 'error': str(e)}
+        outstream.write(json.dumps(response) + '\n')
+        outstream.flush()
+        if exporter is not None:
+            exporter.export()
+    if exporter is not None:
+        exporter.export(force=True)
+
+# =========================================================================== #
+#  SECTION: Main Body
+# =========================================================================== #
+
+if __name__ == '__main__':
+    serve()
@@ -20,13 +20,24 @@ tool for cropping a game board of rectangular shapes into single images
 #  SECTION: Imports                                                           
 # =========================================================================== #
 # standard:
-import cv2
 import numpy as np
 import time
 import os
+import mmap
+import concurrent.futures
+import itertools
+import threading
+import collections
+import contextlib
+import hashlib
 
 # local:
+from LazyImport import lazy_import
+import Metrics
 import ShapeAnalysis
+
+# cv2 is loaded on the first pixel operation
+cv2 = lazy_import('cv2')
 # =========================================================================== #
 #  SECTION: Global definitions
 # =========================================================================== #
@@ -37,6 +48,143 @@ FILENAME = "Testbilder/photo_test6_3.jpg"
 LOWER_RED = np.array([170, 50, 50])
 UPPER_RED= np.array([180, 255, 255])
 
+# files that open_source memory-maps for the memory bounded mode
+MAPPED_EXTENSIONS = ('.npy', '.raw')
+
+# area limits of a red dot in a 1500x1000 image
+MIN_DOT_AREA = 1
+MAX_DOT_AREA = 250
+# adaptive detector: hues around the red range that are searched for the
+# peak of the red dots
+RED_HUE_MARGIN = 10
+# adaptive detector: hues of the peak down to this fraction of its height
+# belong to the red dots
+RED_HUE_FRACTION = 0.05
+
+# quality gate for the cell geometry of one game board
+# maximal relative standard deviation of the cell areas in %
+MAX_AREA_DEVIATION = 10
+# maximal relative standard deviation of the cell aspect ratios in %
+MAX_ASPECT_DEVIATION = 10
+# maximal deviation of a cell corner angle from 90 degree
+MAX_ANGLE_DEVIATION = 10
+# maximal distance of a red dot from the nearest knot of the lattice in
+# the 1500x1000 image, only checked with the remap setting
+MAX_DOT_DEVIATION = 10
+# maximal pixels of all remapped cells relative to the pixels of the image
+MAX_REMAP_RATIO = 4
+
+# minimal area of a board relative to the largest board in one photo
+BOARD_AREA_RATIO = 0.5
+# boards are in the same row if their vertical ranges overlap by at least
+# this part of the smaller one
+ROW_OVERLAP_RATIO = 0.5
+
+# shared thread pools for the cells, key: number of threads
+CELL_POOLS = dict()
+CELL_POOLS_LOCK = threading.Lock()
+
+# remap tables of the last boards (remap setting), key: see remap_key
+REMAP_CACHE = collections.OrderedDict()
+REMAP_CACHE_SIZE = 8
+REMAP_CACHE_LOCK = threading.Lock()
+
+# default settings of the pipeline, single values can be overwritten
+# by the settings given to seperate_the_objects
+DEFAULT_SETTINGS = {
+    # folder of the saved cutouts, relative paths start at this script
+    'output_dir': 'cutouts',
+    # file format of the saved cutouts
+    'file_format': 'jpg',
+    # amount of rectangles on the game board
+    'columns': ShapeAnalysis.DOTS_IN_LINE-1,
+    'rows': ShapeAnalysis.LINES-1,
+    # range of red colors
+    'lower_red': LOWER_RED,
+    'upper_red': UPPER_RED,
+    # cut out the rectangles, if False they are only found and checked
+    'cut': True,
+    # find every game board in the photo instead of only the largest
+    'multi_board': False,
+    # threads for processing the boards of one photo, None for all cores
+    'threads': None,
+    # threads of the shared pool that cuts, rectifies and encodes the cells
+    # of one board, 1 cuts them one after another, None for all cores
+    'cell_threads': 1,
+    # threads used inside of cv2 (cv2.setNumThreads) while the image is
+    # processed, None keeps the current value. Use a small value together
+    # with many cell threads.
+    'cv2_threads': None,
+    # warp every cell to an upright rectangle instead of masking its
+    # bounding box
+    'rectify': False,
+    # estimate the red hues per image (find_red_dots) and keep the dot
+    # centers, corners and knots in subpixels
+    'adaptive': False,
+    # cut all cells with one remap table from the unresized image, the
+    # cells are upright in the orientation of the photo and equally sized
+    'remap': False,
+    # (width, height) of the remapped cells, None for the median cell size
+    'cell_size': None,
+    # folder for the remap tables of fixed camera rigs, relative paths
+    # start at this script, None keeps them only in memory
+    'remap_cache': None,
+    # without output_dir: return the encoded image files (file_format)
+    # instead of the image arrays
+    'encode': False,
+    # memory bounded mode for .npy and .raw files: MB for the 1500x1000
+    # proxy plus the image strip or the cell tiles and their warped copies
+    # that are in memory at the same time, None reads the whole image
+    'max_memory': None,
+    # (height, width) of .raw input files
+    'raw_shape': None,
+    # show and save the debug images
+    'debug': False,
+}
+
+# =========================================================================== #
+#  SECTION: Class definitions
+# =========================================================================== #
+class MemoryBudget:
+    """
+    bytes of the memory bounded mode that are in use at the same time. A
+    tile waits until enough bytes are free, so the tiles of all cell threads
+    together never exceed the limit.
+    """
+    def __init__(self, limit:int):
+        self.limit = limit
+        self.used = 0
+        # most bytes in use at the same time
+        self.peak = 0
+        self.condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def reserve(self, size:int, what:str="tile"):
+        """
+        hold size bytes while the context is open, wait until they are free
+
+        Parameters
+        ----------
+        size : int
+            number of bytes
+        what : str, optional
+            name of the memory in the error message, by default "tile"
+        """
+        if size > self.limit:
+            raise ValueError("{} needs {:.1f} MB, more than the {:.1f} MB of "
+                             "the memory limit".format(
+                                 what, size/2**20, self.limit/2**20))
+        with self.condition:
+            self.condition.wait_for(lambda: self.used + size <= self.limit)
+            self.used += size
+            self.peak = max(self.peak, self.used)
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.used -= size
+                self.condition.notify_all()
+
 # =========================================================================== #
 #  SECTION: Function definitions
 # =========================================================================== #
@@ -59,21 +207,283 @@ def read_image(fileName:str)->np.array:
     return cv2.imread(image_path)
 
 
-def find_red_dots(img:np.array, debug=True)->dict:
+def decode_image(data)->np.array:
+    """decode an encoded image file (jpg, png, ...) from memory
+
+    Parameters
+    ----------
+    data : bytes, bytearray, memoryview or mmap
+        content of the image file
+
+    Returns
+    -------
+    np.array
+        3D matrix based on the colors in the image, None if the data can
+        not be decoded
+    """
+    buffer = np.frombuffer(data, np.uint8)
+    if buffer.size == 0:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def read_mapped_image(fileName:str)->np.array:
+    """read in an image file through a memory map, the file content is
+    decoded directly from the page cache without copying it into python
+
+    Parameters
+    ----------
+    fileName : str
+        relative path of the image
+
+    Returns
+    -------
+    np.array
+        3D matrix based on the colors in the image
+    """
+    path = os.path.dirname(os.path.abspath(__file__))
+    image_path = os.path.join(path, fileName)
+    with open(image_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return decode_image(mapped)
+
+
+def load_image(source)->np.array:
+    """load an image from any supported source
+
+    Parameters
+    ----------
+    source : str, bytes, bytearray, memoryview, mmap or np.array
+        path of the image file, content of an image file in memory, or
+        an already decoded image (BGR, BGRA or grayscale). A 1D uint8 array
+        is treated as the content of an image file.
+
+    Returns
+    -------
+    np.array
+        3D BGR matrix based on the colors in the image, None if the
+        source can not be decoded
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return read_image(source)
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return decode_image(source)
+    if isinstance(source, np.ndarray):
+        if source.ndim == 1:
+            return decode_image(source)
+        if source.ndim == 2:
+            return cv2.cvtColor(source, cv2.COLOR_GRAY2BGR)
+        if source.ndim == 3 and source.shape[2] == 4:
+            return cv2.cvtColor(source, cv2.COLOR_BGRA2BGR)
+        if source.ndim == 3 and source.shape[2] == 3:
+            return source
+        raise ValueError(f"unsupported image shape {source.shape}")
+    raise TypeError(f"unsupported image source {type(source).__name__}")
+
+
+def open_source(source, raw_shape:tuple=None)->np.array:
+    """open the full resolution image for the memory bounded mode. numpy
+    (.npy) and raw BGR (.raw) files are memory-mapped, so only the pixels
+    that are accessed are read. Every other source is loaded with
+    load_image.
+
+    Parameters
+    ----------
+    source : str or any other source of load_image
+        path of the image file
+    raw_shape : tuple, optional
+        (height, width) of a .raw file with 8 bit BGR pixels, by default None
+
+    Returns
+    -------
+    np.array
+        (height, width, 3) uint8 image, memory-mapped if possible
+    """
+    if isinstance(source, (str, os.PathLike)):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), source)
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.npy':
+            source = np.load(path, mmap_mode='r')
+        elif extension == '.raw':
+            if raw_shape is None:
+                raise ValueError("the raw_shape setting is needed for .raw files")
+            source = np.memmap(path, np.uint8, 'r', shape=(*raw_shape, 3))
+        else:
+            return load_image(source)
+        if source.ndim != 3 or source.shape[2] != 3 or source.dtype != np.uint8:
+            raise ValueError(f"expected 8 bit BGR pixels, got {source.dtype} "
+                             f"{source.shape}")
+        return source
+    return load_image(source)
+
+
+def is_mapped_source(source)->bool:
+    """
+    check that open_source does not decode the source as a whole: .npy and
+    .raw files are memory-mapped, numpy images are used as they are
+
+    Parameters
+    ----------
+    source : str or any other source of load_image
+        path of the image file
+
+    Returns
+    -------
+    bool
+        True if the memory bounded mode can read the source tile by tile
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.splitext(os.fspath(source))[1].lower() in MAPPED_EXTENSIONS
+    return isinstance(source, np.ndarray) and source.ndim == 3 \
+        and source.shape[2] == 3
+
+
+def build_proxy(source:np.array, max_bytes:int, size:tuple=(1500, 1000))->np.array:
+    """downscale the source strip by strip, no strip is larger than max_bytes
+
+    Parameters
+    ----------
+    source : np.array
+        full resolution image, e.g. memory-mapped
+    max_bytes : int
+        maximal size of one strip of the source
+    size : tuple, optional
+        (width, height) of the proxy, by default (1500, 1000)
+
+    Returns
+    -------
+    np.array
+        downscaled image
+    """
+    height, width = source.shape[:2]
+    proxy = np.empty((size[1], size[0], 3), np.uint8)
+    # output rows of one strip, so the source rows of it fit into max_bytes
+    source_rows = max_bytes // (width*source.shape[2]*source.itemsize)
+    if source_rows < 1:
+        raise ValueError("one row of the image needs more than the {:.1f} MB "
+                         "of the memory limit".format(max_bytes/2**20))
+    rows = max(1, int(source_rows*size[1]/height))
+    for top in range(0, size[1], rows):
+        bottom = min(size[1], top + rows)
+        start = int(top*height/size[1])
+        stop = max(start + 1, int(round(bottom*height/size[1])))
+        strip = np.ascontiguousarray(source[start:stop])
+        proxy[top:bottom] = cv2.resize(
+            strip, (size[0], bottom - top), interpolation=cv2.INTER_AREA)
+    return proxy
+
+
+def red_hue_range(hsv:np.array, lower:np.array=LOWER_RED,
+                  upper:np.array=UPPER_RED)->tuple:
+    """
+    estimate the hues of the red dots from the hue histogram of the
+    saturated and bright pixels. The peak is searched up to RED_HUE_MARGIN
+    around the given range and extended down to RED_HUE_FRACTION of its
+    height. The hues are shifted by 90, so the range can wrap around 180.
+
+    Parameters
+    ----------
+    hsv : np.array
+        image in the HSV color space
+    lower : np.array, optional
+        lower HSV limit of the red colors, by default LOWER_RED
+    upper : np.array, optional
+        upper HSV limit of the red colors, by default UPPER_RED
+
+    Returns
+    -------
+    tuple
+        lowest and highest shifted hue of the red dots, the given range if
+        no pixel is found
+    """
+    first, last = (int(lower[0]) + 90) % 180, (int(upper[0]) + 90) % 180
+    colored = (hsv[..., 1] >= lower[1]) & (hsv[..., 2] >= lower[2])
+    histogram = np.roll(np.bincount(hsv[..., 0][colored], minlength=180), 90)
+    begin = max(min(first, last) - RED_HUE_MARGIN, 0)
+    end = min(max(first, last) + RED_HUE_MARGIN, 179)
+    window = histogram[begin:end+1]
+    if not window.any():
+        return min(first, last), max(first, last)
+    peak = begin + int(np.argmax(window))
+    limit = histogram[peak]*RED_HUE_FRACTION
+    low = high = peak
+    while low > begin and histogram[low-1] >= limit:
+        low -= 1
+    while high < end and histogram[high+1] >= limit:
+        high += 1
+    return low, high
+
+
+def dot_centers(mask:np.array, weights:np.array, min_area:float,
+                max_area:float)->tuple:
+    """
+    intensity weighted centers of the connected areas of the mask, the
+    moments of all areas are summed up at once
+
+    Parameters
+    ----------
+    mask : np.array
+        binary image of the red pixels
+    weights : np.array
+        intensity of every pixel
+    min_area : float
+        areas up to this size are ignored
+    max_area : float
+        areas from this size on are ignored
+
+    Returns
+    -------
+    tuple
+        (n, 2) subpixel centers, (n,) radii of circles with the same area
+    """
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, 8)
+    y, x = np.nonzero(mask)
+    label = labels[y, x]
+    w = weights[y, x].astype(np.float64)
+    m00 = np.bincount(label, w, count)
+    m10 = np.bincount(label, w*x, count)
+    m01 = np.bincount(label, w*y, count)
+    area = stats[:, cv2.CC_STAT_AREA]
+    # label 0 is the background
+    keep = (area > min_area) & (area < max_area) & (m00 > 0)
+    keep[0] = False
+    centers = np.stack([m10[keep]/m00[keep], m01[keep]/m00[keep]], axis=1)
+    # the labels are numbered from the top, cv2.findContours lists the dots
+    # from the bottom and Grid depends on this order
+    return centers[::-1], np.sqrt(area[keep]/np.pi)[::-1]
+
+
+def find_red_dots(img:np.array, debug=True, lower:np.array=LOWER_RED,
+                  upper:np.array=UPPER_RED, adaptive:bool=False,
+                  scale:float=1.0)->ShapeAnalysis.PointSet:
     """finding red dots on an image
 
     Parameters
     ----------
     img : np.array
         3D matrix based on the colors in the image
+    lower : np.array, optional
+        lower HSV limit of the red colors, by default LOWER_RED
+    upper : np.array, optional
+        upper HSV limit of the red colors, by default UPPER_RED
+    adaptive : bool, optional
+        estimate the red hues of this image (red_hue_range), scale the area
+        limits with the resolution and find intensity weighted subpixel
+        centers, by default False
+    scale : float, optional
+        expected magnification of the dot areas compared to the photo, e.g.
+        of a warped image, the area limits are scaled with it, by default 1.0
 
     Returns
     -------
-    dict
-        dict of the coordinates for every red dot
-        key: number from 1 to n, with n amount of found red dots
-        value: coordinate of the red dot [numpy array]
+    ShapeAnalysis.PointSet
+        coordinates of the found red dots in the 1500x1000 image
     """
+    if adaptive:
+        return find_red_dots_adaptive(img, debug, lower, upper, scale)
+
     #Read in image and resize
     img = cv2.resize(img, (1500, 1000))
     
@@ -81,7 +491,7 @@ def find_red_dots(img:np.array, debug=True)->dict:
     hsv_img = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
     
     #filter all parts within the red spectrum
-    mask = cv2.inRange(hsv_img, LOWER_RED, UPPER_RED)
+    mask = cv2.inRange(hsv_img, lower, upper)
     
     #reduce the image to the "red parts"
     res, thresh_img = cv2.threshold(
@@ -92,75 +502,174 @@ def find_red_dots(img:np.array, debug=True)->dict:
         thresh_img, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
     
     count = 0
-    points = dict()
+    points = np.empty((len(contours), 2), np.float32)
+    radii = np.empty(len(contours), np.float32)
     for c in contours:
         area = cv2.contourArea(c)
-        if area > 1 and area < 250:
+        if area > MIN_DOT_AREA*scale and area < MAX_DOT_AREA*scale:
             (x, y), radius = cv2.minEnclosingCircle(c)
-            center = (int(x), int(y))
-            points[count] = center
+            points[count] = (int(x), int(y))
+            radii[count] = radius
             count += 1
-            radius = int(radius)
-            img = cv2.circle(img, center, radius, (0, 255, 0), 10)
-            cv2.circle(img, center, radius, (0, 255, 0), 10)
-            x, y, w, h = cv2.boundingRect(c)
+    points = ShapeAnalysis.PointSet(points[:count])
     if debug:
-        debug = img.copy()
-        debug = cv2.resize(debug, (750, 500))
-        cv2.imshow('test', debug)
-        cv2.waitKey(0)
-        cv2.destroyAllWindows()
+        show_dots(img, points.points, radii[:count])
     return points
 
 
-def find_paper(img: np.array) -> np.array:
+def find_red_dots_adaptive(img:np.array, debug=True, lower:np.array=LOWER_RED,
+                           upper:np.array=UPPER_RED,
+                           scale:float=1.0)->ShapeAnalysis.PointSet:
     """
-    finding the paper/game board in the image and cropping the unecessary stuff
+    adaptive version of find_red_dots for changing light, works on the
+    image in its own resolution
+
+    Parameters
+    ----------
+    img : np.array
+        3D matrix based on the colors in the image
+    lower : np.array, optional
+        lower HSV limit of the red colors, the hue is only the starting
+        point of red_hue_range, by default LOWER_RED
+    upper : np.array, optional
+        upper HSV limit of the red colors, by default UPPER_RED
+    scale : float, optional
+        expected magnification of the dot areas, by default 1.0
+
+    Returns
+    -------
+    ShapeAnalysis.PointSet
+        subpixel coordinates of the found red dots in the 1500x1000 image
+    """
+    height, width = img.shape[:2]
+    hsv_img = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    low, high = red_hue_range(hsv_img, lower, upper)
+    # shift the hues by 90, so the red range does not wrap around 180
+    shift = ((np.arange(256) + 90) % 180).astype(np.uint8)
+    hsv_img[..., 0] = shift[hsv_img[..., 0]]
+    mask = cv2.inRange(hsv_img, np.array([low, lower[1], lower[2]]),
+                       np.array([high, upper[1], upper[2]]))
+    # the area limits are meant for 1500x1000 images
+    factor = scale*width*height/(1500*1000)
+    centers, radii = dot_centers(mask, hsv_img[..., 1],
+                                 MIN_DOT_AREA*factor, MAX_DOT_AREA*factor)
+    points = (centers*(1500/width, 1000/height)).astype(np.float32)
+    points = ShapeAnalysis.PointSet(points)
+    if debug:
+        img = cv2.resize(img, (1500, 1000))
+        show_dots(img, points.points, radii*1500/width)
+    return points
+
+
+def show_dots(img:np.array, points:np.array, radii:np.array):
+    """show the found dots in a debug window"""
+    for center, radius in zip(points.astype(int).tolist(),
+                              np.asarray(radii).astype(int).tolist()):
+        cv2.circle(img, center, radius, (0, 255, 0), 10)
+    debug = img.copy()
+    debug = cv2.resize(debug, (750, 500))
+    cv2.imshow('test', debug)
+    cv2.waitKey(0)
+    cv2.destroyAllWindows()
+
+
+def find_boards(img: np.array, all_boards: bool = True) -> list:
+    """
+    finding the contours of the papers/game boards in the image
 
     Parameters
     ----------
     img : np.array
         image
+    all_boards : bool, optional
+        if True every board sized contour is returned, else only the
+        largest one, by default True
 
     Returns
     -------
-    np.array
-        resized cropped image
+    list
+        contours of the boards, sorted row by row from the top left
     """
     # convert to grayscale
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     # threshold
-    thresh = cv2.threshold(gray, 100, 255, cv2.THRESH_BINARY)[1]\
+    thresh = cv2.threshold(gray, 100, 255, cv2.THRESH_BINARY)[1]
     # apply morphology
     kernel = np.ones((7, 7), np.uint8)
     morph = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
     kernel = np.ones((9, 9), np.uint8)
     morph = cv2.morphologyEx(morph, cv2.MORPH_ERODE, kernel)
-    # get largest contour
     contours = cv2.findContours(morph, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
     contours = contours[0] if len(contours) == 2 else contours[1]
-    area_thresh = 0
-    for c in contours:
-        area = cv2.contourArea(c)
-        if area > area_thresh:
-            area_thresh = area
-            big_contour = c
-    # get bounding box
-    x, y, w, h = cv2.boundingRect(big_contour)
+    if len(contours) == 0:
+        raise ValueError("no game board found")
+    areas = np.array([cv2.contourArea(c) for c in contours])
+    if not all_boards:
+        # get largest contour
+        return [contours[int(np.argmax(areas))]]
+    # every contour in the size of the largest one is a board
+    boards = [c for c, area in zip(contours, areas)
+              if area >= BOARD_AREA_RATIO*areas.max()]
+    boxes = [cv2.boundingRect(c) for c in boards]
+    # group the boards from the top into rows by the overlap of their
+    # vertical ranges, then sort every row from the left
+    rows = list()
+    for i in sorted(range(len(boards)), key=lambda i: boxes[i][1]):
+        x, y, w, h = boxes[i]
+        if rows:
+            top, bottom, members = rows[-1]
+            overlap = min(bottom, y+h) - max(top, y)
+            if overlap >= ROW_OVERLAP_RATIO*min(h, bottom-top):
+                rows[-1] = (top, max(bottom, y+h), members + [i])
+                continue
+        rows.append((y, y+h, [i]))
+    return [boards[i] for top, bottom, members in rows
+            for i in sorted(members, key=lambda i: boxes[i][0])]
+
+
+def mask_board(img: np.array, contour: np.array) -> np.array:
+    """
+    black out everything outside of one board contour
+
+    Parameters
+    ----------
+    img : np.array
+        image
+    contour : np.array
+        contour of the board
+
+    Returns
+    -------
+    np.array
+        image with only the board left
+    """
     # draw filled contour on black background
-    mask = np.zeros_like(gray)
-    mask = cv2.merge([mask, mask, mask])
-    cv2.drawContours(mask, [big_contour], -1, (255, 255, 255), cv2.FILLED)
+    mask = np.zeros(img.shape[:2], np.uint8)
+    cv2.drawContours(mask, [contour], -1, 255, cv2.FILLED)
     # apply mask to input
-    result = img.copy()
-    result = cv2.bitwise_and(result, mask)
-    # crop result
-    return result
+    return cv2.bitwise_and(img, img, mask=mask)
+
+
+def find_paper(img: np.array) -> np.array:
+    """
+    finding the paper/game board in the image and cropping the unecessary stuff
+
+    Parameters
+    ----------
+    img : np.array
+        image
+
+    Returns
+    -------
+    np.array
+        resized cropped image
+    """
+    return mask_board(img, find_boards(img, all_boards=False)[0])
  
  
-def cut_rectangles(img:np.array, edges:list, count:int, debug=False):
+def crop_rectangle(img:np.array, edges:list)->np.array:
     """
-    cut out the single rectangles and save them into new images
+    cut out a single rectangle, everything outside of the rectangle is black
 
     Parameters
     ----------
@@ -168,17 +677,17 @@ def cut_rectangles(img:np.array, edges:list, count:int, debug=False):
         image
     edges : list
         list of points that representing the corners of the rectangle
-    count : int
-        increasing number for each found rectangle
-    debug : bool, optional
-        if True saves image where the found rectangle boarders are marked, by default False
+
+    Returns
+    -------
+    np.array
+        bounding box of the rectangle
     """
-    original_image_copy = img.copy()
-    pts = np.array(edges).astype(np.int)
+    pts = np.rint(np.array(edges)).astype(int)
     ## (1) Crop the bounding rect
     rect = cv2.boundingRect(pts)
     x, y, w, h = rect
-    croped = original_image_copy[y:y+h, x:x+w]
+    croped = img[y:y+h, x:x+w]
     
     ## (2) make mask
     pts2 = pts - pts.min(axis=0)
@@ -186,53 +695,164 @@ def cut_rectangles(img:np.array, edges:list, count:int, debug=False):
     cv2.drawContours(mask, [pts2], -1, (255, 255, 255), -1, cv2.LINE_AA)
     
     ## (3) do bit-op
-    dst = cv2.bitwise_and(croped, croped, mask=mask)
-    
-    ## (4) save images
-    path = os.path.dirname(os.path.abspath(__file__))
-    image_path = os.path.join(path, "cutouts/roi")
+    return cv2.bitwise_and(croped, croped, mask=mask)
+
+
+def rectify_rectangle(img:np.array, edges:list)->np.array:
+    """
+    warp a single rectangle into an upright image of its own size
+
+    Parameters
+    ----------
+    img : np.array
+        image
+    edges : list
+        list of points that representing the corners of the rectangle in
+        the order of Grid.find_rectangles (bottom right, top right, top left,
+        bottom left)
+
+    Returns
+    -------
+    np.array
+        rectified rectangle
+    """
+    pts = np.asarray(edges, dtype=np.float32)
+    lengths = np.linalg.norm(pts - np.roll(pts, -1, axis=0), axis=1)
+    height = max(int(lengths[0]), int(lengths[2]), 1)
+    width = max(int(lengths[1]), int(lengths[3]), 1)
+    output_pts = np.float32([[width - 1, height - 1],
+                             [width - 1, 0],
+                             [0, 0],
+                             [0, height - 1]])
+    M = cv2.getPerspectiveTransform(pts, output_pts)
+    return cv2.warpPerspective(img, M, (width, height), flags=cv2.INTER_LINEAR)
+
+
+def save_cutout(cutout:np.array, count:int, output_dir:str="cutouts",
+                file_format:str="jpg")->str:
+    """
+    save one cutout as roi<count> in the output folder
+
+    Parameters
+    ----------
+    cutout : np.array
+        image of the rectangle
+    count : int
+        increasing number for each found rectangle
+    output_dir : str, optional
+        folder of the saved images, relative paths start at this script,
+        by default "cutouts"
+    file_format : str, optional
+        file extension of the saved images, by default "jpg"
+
+    Returns
+    -------
+    str
+        path of the saved cutout
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), output_dir)
+    os.makedirs(path, exist_ok=True)
+    roi_path = os.path.join(path, "roi") + str(count) + "." + file_format
+    cv2.imwrite(roi_path, cutout)
+    return roi_path
+
+
+def encode_cutout(cutout:np.array, settings:dict):
+    """
+    encode one cutout with the encode setting
+
+    Parameters
+    ----------
+    cutout : np.array
+        image of the rectangle
+    settings : dict
+        pipeline settings
+
+    Returns
+    -------
+    bytes or np.array
+        encoded image file, or the cutout if the encode setting is off
+    """
+    if settings['encode']:
+        return cv2.imencode('.' + settings['file_format'], cutout)[1].tobytes()
+    return cutout
+
+
+def cut_rectangles(img:np.array, edges:list, count:int, debug=False,
+                   output_dir:str="cutouts", file_format:str="jpg",
+                   rectify:bool=False)->str:
+    """
+    cut out the single rectangles and save them into new images
+
+    Parameters
+    ----------
+    img : np.array
+        image
+    edges : list
+        list of points that representing the corners of the rectangle
+    count : int
+        increasing number for each found rectangle
+    debug : bool, optional
+        if True saves image where the found rectangle boarders are marked, by default False
+    output_dir : str, optional
+        folder of the saved images, relative paths start at this script,
+        by default "cutouts"
+    file_format : str, optional
+        file extension of the saved images, by default "jpg"
+    rectify : bool, optional
+        if True the rectangle is warped upright instead of masked,
+        by default False
+
+    Returns
+    -------
+    str
+        path of the saved cutout
+    """
+    if rectify:
+        dst = rectify_rectangle(img, edges)
+    else:
+        dst = crop_rectangle(img, edges)
     
-    cv2.imwrite(image_path+str(count)+".jpg", dst)
+    ## save images
+    roi_path = save_cutout(dst, count, output_dir, file_format)
     
     if debug:
-        image_path = os.path.join(path, "cutouts/debug")
+        image_path = os.path.join(os.path.dirname(roi_path), "debug")
         # Blue color in BGR
         color = (255, 0, 0)
         # Line thickness of 2 px
         thickness = 2
+        pts = np.rint(np.array(edges)).astype(int)
         image = cv2.polylines(img.copy(), [pts], True, color, 8)
-        cv2.imwrite(image_path + str(count)+".jpg", image)
+        cv2.imwrite(image_path + str(count) + "." + file_format, image)
         cv2.imshow('test',image)
         cv2.waitKey(0)
         cv2.destroyAllWindows()
+    return roi_path
 
-    size = dst.shape
-    area = size[0]*size[1]
-    return area
-
-def warp_perspektive(img:np.array, corners:list)->np.array:
+def perspective_transform(corners:dict)->tuple:
     """
-    warpes the perspective of the image with the information of the 
-    red dot corners (needs corners to function!!!)
+    perspective transform that warp_perspektive applies for the given
+    red dot corners
 
     Parameters
     ----------
-    img : np.array
-        image to warp
-    corners : list
-        list of the corner coordinates
+    corners : dict
+        corner coordinates of Grid
 
     Returns
     -------
-    np.array
-        warped image
+    tuple
+        3x3 transformation matrix M, (width, height) of the warped image
+        before it is resized to 1500x1000
     """
     
-    #TODO questionable coordinate order
-    pt_A = corners['D']
-    pt_B = corners['A']
-    pt_C = corners['B']
-    pt_D = corners['C']
+    # top left, bottom left, bottom right, top right like in Grid, so the
+    # board keeps the orientation of the photo
+    pt_A = corners['A']
+    pt_B = corners['B']
+    pt_C = corners['C']
+    pt_D = corners['D']
     
     # L2 norm
     width_AD = np.sqrt(((pt_A[0] - pt_D[0]) ** 2) + ((pt_A[1] - pt_D[1]) ** 2))
@@ -251,64 +871,1022 @@ def warp_perspektive(img:np.array, corners:list)->np.array:
                              [maxWidth - 10, 10]])
     # Compute the perspective transform M
     M = cv2.getPerspectiveTransform(input_pts, output_pts)
-    img_copy = np.copy(img)
-    out = cv2.warpPerspective(
-        img_copy, M, (maxWidth, maxHeight), flags=cv2.INTER_LINEAR)
-    return cv2.resize(out, (1500, 1000))
+    return M, (maxWidth, maxHeight)
 
-def check_cutouts(sizes:list()):
-    #TODO define consequence, wenn std above 10%
-    np_sizes = np.array(sizes)
-    mean = np.mean(np_sizes)
-    std = ShapeAnalysis.round_data(data=np.std(np_sizes)/mean*100,digits =2)[0]
-    print(f"The cutouts have a standard deviation of {std} %")
-    if int(std)>=10:
-        pass
-        
-def seperate_the_objects(fileName:str):
+
+def warp_perspektive(img:np.array, corners:list)->np.array:
     """
-    seperates the rectangle shapes from the game board image
+    warpes the perspective of the image with the information of the 
+    red dot corners (needs corners to function!!!)
 
     Parameters
     ----------
-    fileName : str
-        path of the board game image 
+    img : np.array
+        image to warp
+    corners : list
+        list of the corner coordinates
+
+    Returns
+    -------
+    np.array
+        warped image
     """
-    begin = time.time()
-    #Read in image and rezize
-    img = read_image(fileName)
-    #warp_perspektive(img)
-    try:
-        img = cv2.resize(img, (1500, 1000))
-        # Find paper and resize
-        paper = find_paper(img)
-        # Find red dots
-        points = find_red_dots(paper)
-        Shape = ShapeAnalysis.Grid(points)
-        #quit()
-        # warp the perspektive
-        warped = warp_perspektive(img, Shape.corners)
-        points = find_red_dots(warped)
-        # find the new coordinates out of the warped photov
-        new_points = find_red_dots(warped)
-        Shape.set_coordinates(new_points)
-        # find rectangles
-        rectangles = Shape.find_rectangles()
-        sizes = list()
-        for key in rectangles:
-            sizes.append(cut_rectangles(warped, rectangles[key], key))
-        
-        check_cutouts(sizes)
-            
+    M, size = perspective_transform(corners)
+    out = cv2.warpPerspective(img, M, size, flags=cv2.INTER_LINEAR)
+    return cv2.resize(out, (1500, 1000))
+
+
+def warped_corners(corners:dict)->dict:
+    """
+    position of the corners in the warped 1500x1000 image, without warping
+    the image
+
+    Parameters
+    ----------
+    corners : dict
+        corner coordinates of Grid
+
+    Returns
+    -------
+    dict
+        the corners A, B, C and D after warp_perspektive
+    """
+    M, (width, height) = perspective_transform(corners)
+    resize = np.diag([1500/width, 1000/height, 1])
+    points = np.array([corners[key] for key in 'ABCD'], np.float64)
+    points = cv2.perspectiveTransform(points.reshape(-1, 1, 2), resize @ M)
+    return {key: point.astype(np.float32)
+            for key, point in zip('ABCD', points.reshape(-1, 2))}
+
+
+def warp_scale(corners:dict)->float:
+    """
+    magnification of the areas by warp_perspektive
+
+    Parameters
+    ----------
+    corners : dict
+        corner coordinates of Grid
+
+    Returns
+    -------
+    float
+        area of the warped 1500x1000 image divided by the area of the
+        convex hull of the corners
+    """
+    points = np.array([corners[key] for key in 'ABCD'], np.float32)
+    area = cv2.contourArea(cv2.convexHull(points))
+    return 1500*1000/max(area, 1.0)
+
+
+def source_transform(corners:dict, source_shape:tuple)->np.array:
+    """
+    transformation from the coordinates of the warped 1500x1000 image back
+    to the coordinates of the full resolution source, of which the image
+    passed to warp_perspektive is the 1500x1000 proxy
+
+    Parameters
+    ----------
+    corners : dict
+        corner coordinates of Grid in the proxy image
+    source_shape : tuple
+        shape of the source image
+
+    Returns
+    -------
+    np.array
+        3x3 transformation matrix
+    """
+    M, (width, height) = perspective_transform(corners)
+    # undo the resize of warp_perspektive
+    unresize = np.diag([width/1500, height/1000, 1])
+    # scale from the proxy to the source
+    upscale = np.diag([source_shape[1]/1500, source_shape[0]/1000, 1])
+    return upscale @ np.linalg.inv(M) @ unresize
+
+
+def source_cells(corners:dict, rectangles:np.array, source_shape:tuple)->np.array:
+    """
+    corner points of the rectangles in the coordinates of the source
+
+    Parameters
+    ----------
+    corners : dict
+        corner coordinates of Grid in the proxy image
+    rectangles : np.array
+        (n, 4, 2) corner points of the rectangles in the warped proxy
+    source_shape : tuple
+        shape of the source image
+
+    Returns
+    -------
+    np.array
+        (n, 4, 2) corner points in the source
+    """
+    transform = source_transform(corners, source_shape)
+    cells = cv2.perspectiveTransform(
+        rectangles.reshape(-1, 1, 2).astype(np.float64), transform)
+    return cells.reshape(rectangles.shape)
+
+
+def source_frame(corners:dict, rectangles:np.array, source_shape:tuple)->tuple:
+    """
+    the warped image in the resolution of the source: like warp_perspektive,
+    but without the final resize to 1500x1000 and scaled from the proxy to
+    the source. The cells of the memory bounded mode are cut from this frame.
+
+    Parameters
+    ----------
+    corners : dict
+        corner coordinates of Grid in the proxy image
+    rectangles : np.array
+        (n, 4, 2) corner points of the rectangles in the warped proxy
+    source_shape : tuple
+        shape of the source image
+
+    Returns
+    -------
+    tuple
+        (n, 4, 2) corner points of the rectangles in the frame, 3x3
+        transformation from the frame to the source
+    """
+    M, (width, height) = perspective_transform(corners)
+    # undo the resize and the 10 pixel margin of warp_perspektive, so the
+    # cells keep their size in the source
+    scale = np.array([width/1500*width/(width - 20)*source_shape[1]/1500,
+                      height/1000*height/(height - 20)*source_shape[0]/1000])
+    transform = source_transform(corners, source_shape) \
+        @ np.diag([1/scale[0], 1/scale[1], 1])
+    return rectangles.astype(np.float64)*scale, transform
+
+
+def remap_cell_size(cells:np.array)->tuple:
+    """
+    median size of the cells in the orientation of the photo
+
+    Parameters
+    ----------
+    cells : np.array
+        (n, 4, 2) corner points in the order of Grid.find_rectangles
+
+    Returns
+    -------
+    tuple
+        (width, height) in pixels
+    """
+    lengths = np.linalg.norm(cells - np.roll(cells, -1, axis=1), axis=2)
+    # the first and third edge of a rectangle are the vertical ones
+    width = np.median((lengths[:, 1] + lengths[:, 3])/2)
+    height = np.median((lengths[:, 0] + lengths[:, 2])/2)
+    return max(int(round(width)), 1), max(int(round(height)), 1)
+
+
+def remap_key(cells:np.array, size:tuple, source_shape:tuple)->str:
+    """
+    fingerprint of a remap table, the cell corners are rounded to 0.1 pixel
+
+    Parameters
+    ----------
+    cells : np.array
+        (n, 4, 2) corner points in the source
+    size : tuple
+        (width, height) of the cells
+    source_shape : tuple
+        shape of the source image
+
+    Returns
+    -------
+    str
+        hex digest
+    """
+    digest = hashlib.sha1(np.round(cells, 1).astype(np.float32).tobytes())
+    digest.update(np.array([*size, *source_shape[:2]], np.int64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def cell_points(size:tuple)->np.array:
+    """corners of a remapped cell of the given (width, height): bottom
+    right, top right, top left, bottom left like rectify_rectangle"""
+    width, height = size
+    return np.float32([[width - 1, height - 1],
+                       [width - 1, 0],
+                       [0, 0],
+                       [0, height - 1]])
+
+
+def build_remap(cells:np.array, size:tuple)->tuple:
+    """
+    remap table of all cells: the cells are stacked from top to bottom, every
+    output pixel points directly to its position in the source
+
+    Parameters
+    ----------
+    cells : np.array
+        (n, 4, 2) corner points in the source in the order of
+        Grid.find_rectangles
+    size : tuple
+        (width, height) of one cell
+
+    Returns
+    -------
+    tuple
+        fixed point maps of cv2.convertMaps for cv2.remap
+    """
+    width, height = size
+    output_pts = cell_points(size)
+    v, u = np.mgrid[0:height, 0:width]
+    pixels = np.stack([u.ravel(), v.ravel(), np.ones(u.size)])
+    map_x = np.empty((len(cells)*height, width), np.float32)
+    map_y = np.empty_like(map_x)
+    for i, cell in enumerate(cells):
+        M = cv2.getPerspectiveTransform(output_pts, cell.astype(np.float32))
+        x, y, w = M @ pixels
+        map_x[i*height:(i+1)*height] = (x/w).reshape(height, width)
+        map_y[i*height:(i+1)*height] = (y/w).reshape(height, width)
+    return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+
+def cell_remap(cells:np.array, size:tuple, source_shape:tuple,
+               cache_dir:str=None)->tuple:
+    """
+    remap table of the cells, reused from REMAP_CACHE or the cache folder
+    when the camera and the board did not move
+
+    Parameters
+    ----------
+    cells : np.array
+        (n, 4, 2) corner points in the source
+    size : tuple
+        (width, height) of one cell
+    source_shape : tuple
+        shape of the source image
+    cache_dir : str, optional
+        folder of the saved remap tables, by default None
+
+    Returns
+    -------
+    tuple
+        maps for cv2.remap
+    """
+    key = remap_key(cells, size, source_shape)
+    with REMAP_CACHE_LOCK:
+        if key in REMAP_CACHE:
+            REMAP_CACHE.move_to_end(key)
+            Metrics.inc('cache_hits_total', cache='remap')
+            return REMAP_CACHE[key]
+    path = None
+    if cache_dir is not None:
+        folder = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              cache_dir)
+        path = os.path.join(folder, "remap_" + key + ".npz")
+    if path is not None and os.path.exists(path):
+        Metrics.inc('cache_hits_total', cache='remap_file')
+        with np.load(path) as table:
+            maps = table['map1'], table['map2']
+    else:
+        Metrics.inc('cache_misses_total', cache='remap')
+        maps = build_remap(cells, size)
+        if path is not None:
+            os.makedirs(folder, exist_ok=True)
+            # written under another name first, so parallel workers never
+            # read a half written table
+            temp = path + ".{}.tmp.npz".format(os.getpid())
+            np.savez(temp, map1=maps[0], map2=maps[1])
+            os.replace(temp, path)
+    with REMAP_CACHE_LOCK:
+        REMAP_CACHE[key] = maps
+        while len(REMAP_CACHE) > REMAP_CACHE_SIZE:
+            REMAP_CACHE.popitem(last=False)
+    return maps
+
+
+def check_cutouts(rectangles:dict)->dict:
+    """
+    quality gate for the found rectangles. The geometry of every cell is
+    analysed directly from the corner points, so a bad board can be rejected
+    before any pixels are cut.
+
+    Parameters
+    ----------
+    rectangles : np.array or dict
+        (n, 4, 2) corner points of the rectangles, or a dict of lists of
+        four corner points for each rectangle
+
+    Returns
+    -------
+    dict
+        passed: True if the board passes the quality gate
+        reasons: list of the failed checks
+        area_std: relative standard deviation of the cell areas in %
+        aspect_std: relative standard deviation of the cell aspect ratios in %
+        angle_error: maximal deviation of a corner angle from 90 degree
+        The stats are None if they are undefined, e.g. for cells without area.
+    """
+    quality = {'passed': False, 'reasons': [], 'area_std': None,
+               'aspect_std': None, 'angle_error': None}
+    if isinstance(rectangles, dict):
+        rectangles = [rectangles[key] for key in sorted(rectangles)]
+    if len(rectangles) == 0:
+        quality['reasons'].append('no rectangles found')
+        return quality
+    # (n, 4, 2) array of the corner points of all cells
+    cells = np.asarray(rectangles, dtype=np.float64)
+    x = cells[:, :, 0]
+    y = cells[:, :, 1]
+    # shoelace formula
+    areas = np.abs(np.sum(x*np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1)*y,
+                          axis=1))/2
+    # edge vectors from every corner to the next one
+    edges = np.roll(cells, -1, axis=1) - cells
+    lengths = np.linalg.norm(edges, axis=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        aspects = (lengths[:, 0] + lengths[:, 2])/(lengths[:, 1] + lengths[:, 3])
+        # angle between the outgoing edge and the incoming edge of each corner
+        cos = np.sum(edges*-np.roll(edges, 1, axis=1), axis=2)\
+            / (lengths*np.roll(lengths, 1, axis=1))
+        angles = np.degrees(np.arccos(np.clip(cos, -1, 1)))
+        quality['area_std'] = float(np.std(areas)/np.mean(areas)*100)
+        quality['aspect_std'] = float(np.std(aspects)/np.mean(aspects)*100)
+    quality['angle_error'] = float(np.max(np.abs(angles - 90)))
+    checks = (('area_std', MAX_AREA_DEVIATION, 'area deviation of {:.2f} %'),
+              ('aspect_std', MAX_ASPECT_DEVIATION,
+               'aspect ratio deviation of {:.2f} %'),
+              ('angle_error', MAX_ANGLE_DEVIATION,
+               'corner angle deviation of {:.2f} degree'))
+    for key, limit, reason in checks:
+        # nan values (degenerated cells) are failing every check and are
+        # stored as None, the results are written as JSON
+        if not quality[key] < limit:
+            quality['reasons'].append(reason.format(quality[key]))
+        if not np.isfinite(quality[key]):
+            quality[key] = None
+    quality['passed'] = not quality['reasons']
+    return quality
+
+
+def check_dots(quality:dict, points:ShapeAnalysis.PointSet, corners:dict,
+               rectangles:np.array)->dict:
+    """
+    quality gate of the remap setting: the lattice of the corners is regular
+    in any case, so the red dots of the photo have to be knots of it. Wrong
+    corners, e.g. of a board with a dot at every knot, are rejected.
+
+    Parameters
+    ----------
+    quality : dict
+        result of check_cutouts, updated
+    points : ShapeAnalysis.PointSet
+        red dots found in the 1500x1000 image
+    corners : dict
+        corner coordinates of Grid in the 1500x1000 image
+    rectangles : np.array
+        (n, 4, 2) corner points of the rectangles in the warped image
+
+    Returns
+    -------
+    dict
+        quality plus dot_error: maximal distance of a dot from the nearest
+        knot in pixels
+    """
+    M, (width, height) = perspective_transform(corners)
+    to_warped = np.diag([1500/width, 1000/height, 1]) @ M
+    knots = np.unique(rectangles.reshape(-1, 2), axis=0).astype(np.float64)
+    knots = cv2.perspectiveTransform(
+        knots.reshape(-1, 1, 2), np.linalg.inv(to_warped)).reshape(-1, 2)
+    distances = np.linalg.norm(
+        points.points[:, None] - knots[None], axis=2).min(axis=1)
+    quality['dot_error'] = float(distances.max()) if len(distances) else 0.0
+    if not quality['dot_error'] <= MAX_DOT_DEVIATION:
+        quality['reasons'].append('red dot {:.2f} pixel away from the '
+                                  'lattice'.format(quality['dot_error']))
+        quality['passed'] = False
+    if not np.isfinite(quality['dot_error']):
+        quality['dot_error'] = None
+    return quality
+
+
+def cell_pool(threads:int=None)->concurrent.futures.ThreadPoolExecutor:
+    """
+    shared thread pool for the cells, created on the first use
+
+    Parameters
+    ----------
+    threads : int, optional
+        number of threads, by default one per core
+
+    Returns
+    -------
+    concurrent.futures.ThreadPoolExecutor
+        pool that is reused by all images
+    """
+    threads = threads or os.cpu_count() or 1
+    with CELL_POOLS_LOCK:
+        if threads not in CELL_POOLS:
+            CELL_POOLS[threads] = concurrent.futures.ThreadPoolExecutor(
+                threads, thread_name_prefix="cells")
+        return CELL_POOLS[threads]
+
+
+@contextlib.contextmanager
+def cv2_threads(threads:int=None):
+    """
+    set the threads inside of cv2 for a block and restore the previous
+    value afterwards. cv2.setNumThreads is global for the process, so a
+    long-lived worker is not changed by the settings of one image.
+
+    Parameters
+    ----------
+    threads : int, optional
+        threads of cv2, None keeps the current value, by default None
+    """
+    if threads is None:
+        yield
+        return
+    previous = cv2.getNumThreads()
+    cv2.setNumThreads(threads)
+    try:
+        yield
+    finally:
+        cv2.setNumThreads(previous)
+
+
+def cut_cell(img:np.array, edges:np.array, key:int, settings:dict):
+    """
+    cut out, optionally rectify, and save or encode one rectangle
+
+    Parameters
+    ----------
+    img : np.array
+        warped image of the game board
+    edges : np.array
+        corner points of the rectangle
+    key : int
+        number of the rectangle
+    settings : dict
+        pipeline settings
+
+    Returns
+    -------
+    str, bytes or np.array
+        path of the saved cutout, the encoded image file (encode setting)
+        or the cutout image
+    """
+    if settings['output_dir'] is not None:
+        return cut_rectangles(
+            img, edges, key, settings['debug'], settings['output_dir'],
+            settings['file_format'], settings['rectify'])
+    if settings['rectify']:
+        cutout = rectify_rectangle(img, edges)
+    else:
+        cutout = crop_rectangle(img, edges)
+    return encode_cutout(cutout, settings)
+
+
+def cut_source_cell(source:np.array, cell:np.array, transform:np.array,
+                    key:int, settings:dict, budget:MemoryBudget=None):
+    """
+    read only the tile of one rectangle from the full resolution source,
+    warp it like warp_perspektive and cut it out like cut_cell
+
+    Parameters
+    ----------
+    source : np.array
+        full resolution image, e.g. memory-mapped
+    cell : np.array
+        corner points of the rectangle in the warped image in the resolution
+        of the source, see source_frame
+    transform : np.array
+        3x3 transformation from these coordinates to the source
+    key : int
+        number of the rectangle
+    settings : dict
+        pipeline settings
+    budget : MemoryBudget, optional
+        the tile is read when the bytes of it and of its warped copy are
+        free, by default None (no limit)
+
+    Returns
+    -------
+    str, bytes or np.array
+        see cut_cell
+    """
+    height, width = source.shape[:2]
+    edges = cv2.perspectiveTransform(
+        cell.reshape(-1, 1, 2).astype(np.float64), transform).reshape(-1, 2)
+    x0, y0 = np.clip(np.floor(edges.min(axis=0)), 0, [width, height]).astype(int)
+    x1, y1 = np.clip(np.ceil(edges.max(axis=0)) + 1, 0, [width, height]).astype(int)
+    # bounding box of the warped tile
+    u0, v0 = np.floor(cell.min(axis=0)).astype(int)
+    u1, v1 = (np.ceil(cell.max(axis=0)) + 1).astype(int)
+    pixel_bytes = source.shape[2]*source.itemsize
+    tile_bytes = ((y1 - y0)*(x1 - x0) + (v1 - v0)*(u1 - u0))*pixel_bytes
+    reserved = contextlib.nullcontext() if budget is None \
+        else budget.reserve(tile_bytes, "tile of rectangle {}".format(key))
+    with reserved:
+        tile = np.ascontiguousarray(source[y0:y1, x0:x1])
+        # from the tile to the warped tile
+        M = np.array([[1, 0, -u0], [0, 1, -v0], [0, 0, 1]]) \
+            @ np.linalg.inv(transform) \
+            @ np.array([[1, 0, x0], [0, 1, y0], [0, 0, 1]])
+        tile = cv2.warpPerspective(tile, M, (int(u1 - u0), int(v1 - v0)),
+                                   flags=cv2.INTER_LINEAR)
+        if settings['rectify']:
+            cutout = rectify_rectangle(tile, cell - (u0, v0))
+        else:
+            cutout = crop_rectangle(tile, cell - (u0, v0))
+        return store_cutout(cutout, key, settings)
+
+
+def tile_threads(settings:dict)->int:
+    """number of cells that are cut at the same time"""
+    if settings['cell_threads'] is None:
+        return os.cpu_count() or 1
+    return settings['cell_threads']
+
+
+def cut_source(source:np.array, corners:dict, rectangles:np.array,
+               settings:dict, budget:MemoryBudget=None)->list:
+    """
+    cut out all rectangles of one game board from the full resolution source
+    (memory bounded mode), the rectangles are found on the 1500x1000 proxy.
+    The cell threads only read as many tiles at once as fit into the budget.
+
+    Parameters
+    ----------
+    source : np.array
+        full resolution image, e.g. memory-mapped
+    corners : dict
+        corner coordinates of Grid in the proxy image
+    rectangles : np.array
+        (n, 4, 2) corner points of the rectangles in the warped proxy
+    settings : dict
+        pipeline settings
+    budget : MemoryBudget, optional
+        bytes for the tiles, by default max_memory (None for no limit)
+
+    Returns
+    -------
+    list
+        result of cut_source_cell for every rectangle
+    """
+    if budget is None and settings['max_memory']:
+        budget = MemoryBudget(int(settings['max_memory']*2**20))
+    cells, transform = source_frame(corners, rectangles, source.shape)
+    threads = tile_threads(settings)
+    if threads == 1 or len(cells) < 2:
+        return [cut_source_cell(source, cell, transform, key, settings, budget)
+                for key, cell in enumerate(cells)]
+    return list(cell_pool(threads).map(
+        cut_source_cell, itertools.repeat(source), cells,
+        itertools.repeat(transform), range(len(cells)),
+        itertools.repeat(settings), itertools.repeat(budget)))
+
+
+def store_cutout(cutout:np.array, key:int, settings:dict):
+    """save the cutout into the output_dir, or encode it without one"""
+    if settings['output_dir'] is not None:
+        return save_cutout(cutout, key, settings['output_dir'],
+                           settings['file_format'])
+    return encode_cutout(cutout, settings)
+
+
+def remap_source_cell(source:np.array, cell:np.array, size:tuple, key:int,
+                      settings:dict, budget:MemoryBudget=None):
+    """
+    remap one cell from the tile of the source it covers (memory bounded
+    mode), without a remap table
+
+    Parameters
+    ----------
+    source : np.array
+        full resolution image, e.g. memory-mapped
+    cell : np.array
+        corner points of the rectangle in the source in the order of
+        Grid.find_rectangles
+    size : tuple
+        (width, height) of the cell
+    key : int
+        number of the rectangle
+    settings : dict
+        pipeline settings
+    budget : MemoryBudget, optional
+        the tile is read when the bytes of it and of the cell are free, by
+        default None (no limit)
+
+    Returns
+    -------
+    str, bytes or np.array
+        see store_cutout
+    """
+    height, width = source.shape[:2]
+    x0, y0 = np.clip(np.floor(cell.min(axis=0)), 0, [width, height]).astype(int)
+    x1, y1 = np.clip(np.ceil(cell.max(axis=0)) + 2, 0, [width, height]).astype(int)
+    pixel_bytes = source.shape[2]*source.itemsize
+    tile_bytes = ((y1 - y0)*(x1 - x0) + size[0]*size[1])*pixel_bytes
+    reserved = contextlib.nullcontext() if budget is None \
+        else budget.reserve(tile_bytes, "tile of rectangle {}".format(key))
+    with reserved:
+        tile = np.ascontiguousarray(source[y0:y1, x0:x1])
+        M = cv2.getPerspectiveTransform(
+            cell_points(size), (cell - (x0, y0)).astype(np.float32))
+        cutout = cv2.warpPerspective(
+            tile, M, tuple(size), flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP)
+        return store_cutout(cutout, key, settings)
+
+
+def remap_board(source:np.array, corners:dict, rectangles:np.array,
+                settings:dict, budget:MemoryBudget=None)->list:
+    """
+    cut out all rectangles of one game board with a single cv2.remap from
+    the unresized image, without the warped intermediate image. The cells
+    have the same size and are upright in the orientation of the photo.
+    The rectangles follow from the corners alone (warped_corners), so the
+    image is never warped and the dots are only searched once.
+
+    Parameters
+    ----------
+    source : np.array
+        unresized image of the game board
+    corners : dict
+        corner coordinates of Grid in the resized image
+    rectangles : np.array
+        (n, 4, 2) corner points of the rectangles in the warped image
+    settings : dict
+        pipeline settings
+    budget : MemoryBudget, optional
+        bytes for the tiles of the memory bounded mode, by default
+        max_memory (None for no limit)
+
+    Returns
+    -------
+    list
+        result of store_cutout for every rectangle
+    """
+    cells = source_cells(corners, rectangles, source.shape)
+    size = settings['cell_size'] or remap_cell_size(cells)
+    if len(cells)*size[0]*size[1] > MAX_REMAP_RATIO*source.shape[0]*source.shape[1]:
+        raise ValueError("remapped cells of {}x{} pixels are much larger than "
+                         "the image".format(*size))
+    if settings['max_memory']:
+        # the remap table of all cells is larger than the cells themselves,
+        # so every cell is remapped from its tile alone
+        if budget is None:
+            budget = MemoryBudget(int(settings['max_memory']*2**20))
+        threads = tile_threads(settings)
+        if threads == 1 or len(cells) < 2:
+            return [remap_source_cell(source, cell, size, key, settings, budget)
+                    for key, cell in enumerate(cells)]
+        return list(cell_pool(threads).map(
+            remap_source_cell, itertools.repeat(source), cells,
+            itertools.repeat(size), range(len(cells)),
+            itertools.repeat(settings), itertools.repeat(budget)))
+    map1, map2 = cell_remap(cells, tuple(size), source.shape,
+                            settings['remap_cache'])
+    tiles = cv2.remap(source, map1, map2, cv2.INTER_LINEAR)
+    tiles = tiles.reshape(len(cells), size[1], *tiles.shape[1:])
+    threads = settings['cell_threads']
+    if threads == 1 or len(tiles) < 2:
+        return [store_cutout(tile, key, settings)
+                for key, tile in enumerate(tiles)]
+    return list(cell_pool(threads).map(
+        store_cutout, tiles, range(len(tiles)), itertools.repeat(settings)))
+
+
+def cut_board(img:np.array, rectangles:np.array, settings:dict)->list:
+    """
+    cut out all rectangles of one game board, with more than one cell
+    thread on the shared pool (cv2 releases the GIL)
+
+    Parameters
+    ----------
+    img : np.array
+        warped image of the game board
+    rectangles : np.array
+        (n, 4, 2) corner points of the rectangles
+    settings : dict
+        pipeline settings
+
+    Returns
+    -------
+    list
+        result of cut_cell for every rectangle
+    """
+    threads = settings['cell_threads']
+    # the debug windows have to be shown one after another
+    if threads == 1 or settings['debug'] or len(rectangles) < 2:
+        return [cut_cell(img, edges, key, settings)
+                for key, edges in enumerate(rectangles)]
+    return list(cell_pool(threads).map(
+        cut_cell, itertools.repeat(img), rectangles, range(len(rectangles)),
+        itertools.repeat(settings)))
+
+
+def process_board(img:np.array, paper:np.array, settings:dict,
+                  source:np.array=None, budget:MemoryBudget=None)->dict:
+    """
+    find, check and cut the rectangles of one game board
+
+    Parameters
+    ----------
+    img : np.array
+        resized image that is warped
+    paper : np.array
+        resized image with only the board left
+    settings : dict
+        pipeline settings
+    source : np.array, optional
+        full resolution image of which img is the proxy, the cells are cut
+        from it (memory bounded mode, remap setting), by default None
+    budget : MemoryBudget, optional
+        bytes for the tiles of the source, see cut_source, by default None
+
+    Returns
+    -------
+    dict
+        status, quality, rectangles, cutouts and error of the board,
+        see seperate_image
+    """
+    debug = settings['debug']
+    lower, upper = settings['lower_red'], settings['upper_red']
+    board = {'status': 'error', 'quality': None, 'rectangles': [],
+             'cutouts': [], 'error': None}
+    try:
+        adaptive = settings['adaptive']
+        # Find red dots
+        with Metrics.stage('dots'):
+            points = find_red_dots(paper, debug, lower, upper, adaptive)
+        Metrics.observe('dots_per_board', len(points), Metrics.DOT_BUCKETS)
+        with Metrics.stage('grid'):
+            # the subpixel centers of the adaptive detector are kept
+            Shape = ShapeAnalysis.Grid(
+                points, settings['columns'], settings['rows'], adaptive)
+        corners = Shape.corners
+        if settings['remap']:
+            # the cells are remapped from the photo, their lattice in the
+            # warped image follows from the corners alone
+            with Metrics.stage('grid'):
+                Shape.set_corners(warped_corners(corners))
+                rectangles = Shape.find_rectangles()
+        else:
+            # warp the perspektive
+            with Metrics.stage('warp'):
+                warped = warp_perspektive(img, corners)
+            # find the new coordinates out of the warped photov, the warp
+            # enlarges the dots
+            with Metrics.stage('dots'):
+                new_points = find_red_dots(warped, debug, lower, upper,
+                                           adaptive, warp_scale(corners))
+            # find rectangles
+            with Metrics.stage('grid'):
+                Shape.set_coordinates(new_points)
+                rectangles = Shape.find_rectangles()
+        board['rectangles'] = rectangles.astype(float).tolist()
+        # check the cell geometry before cutting anything
+        with Metrics.stage('check'):
+            quality = check_cutouts(rectangles)
+            if settings['remap']:
+                check_dots(quality, points, corners, rectangles)
+        board['quality'] = quality
+        if quality['passed']:
+            with Metrics.stage('cut'):
+                if settings['cut'] and settings['remap']:
+                    board['cutouts'] = remap_board(
+                        img if source is None else source, corners,
+                        rectangles, settings, budget)
+                elif settings['cut'] and source is None:
+                    board['cutouts'] = cut_board(warped, rectangles, settings)
+                elif settings['cut']:
+                    board['cutouts'] = cut_source(
+                        source, corners, rectangles, settings, budget)
+            board['status'] = 'ok'
+        else:
+            board['status'] = 'rejected'
+            print('rejected: ' + ', '.join(quality['reasons']))
     except Exception as e:
+        board['error'] = str(e)
         print('error:')
         print(str(e))
-    print(float(time.time()-begin))
-    
+    return board
+
+
+def seperate_boards(img:np.array, settings:dict, source:np.array=None,
+                    budget:MemoryBudget=None)->list:
+    """
+    process every game board of one photo, each board in an own thread
+    (cv2 releases the GIL)
+
+    Parameters
+    ----------
+    img : np.array
+        resized image
+    settings : dict
+        pipeline settings
+    source : np.array, optional
+        full resolution image, see process_board, by default None
+    budget : MemoryBudget, optional
+        bytes for the tiles of the source, shared by all boards, by default
+        None
+
+    Returns
+    -------
+    list
+        result of process_board plus the bounding box (x, y, w, h) of every
+        board, the cutouts of board n are saved in the subfolder board<n>
+    """
+    with Metrics.stage('board'):
+        contours = find_boards(img)
+
+    def process(index, contour):
+        with Metrics.stage('board'):
+            paper = mask_board(img, contour)
+        boardSettings = dict(settings)
+        if settings['output_dir'] is not None:
+            boardSettings['output_dir'] = os.path.join(
+                settings['output_dir'], "board" + str(index))
+        # only the masked board is warped, so no dots of other boards remain
+        board = process_board(paper, paper, boardSettings, source, budget)
+        board['box'] = list(cv2.boundingRect(contour))
+        return board
+
+    threads = min(len(contours), settings['threads'] or os.cpu_count() or 1)
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(process, range(len(contours)), contours))
+
+
+def seperate_image(img:np.array, settings:dict=None, name:str=None,
+                   source:np.array=None, budget:MemoryBudget=None)->dict:
+    """
+    seperates the rectangle shapes from an already loaded game board image
+
+    Parameters
+    ----------
+    img : np.array
+        image of the game board
+    settings : dict, optional
+        values that overwrite the DEFAULT_SETTINGS, by default None
+    name : str, optional
+        name of the image in the result, by default None
+    source : np.array, optional
+        full resolution image of which img is the proxy, the cells are cut
+        from it (memory bounded mode, remap setting), by default None
+    budget : MemoryBudget, optional
+        bytes for the tiles of the source, see cut_source, by default None
+
+    Returns
+    -------
+    dict
+        result of the pipeline:
+        file: name of the board game image
+        status: 'ok', 'rejected' (by the quality gate) or 'error'
+        quality: result of check_cutouts
+        rectangles: corner points of the found rectangles
+        cutouts: paths of the saved cutouts, or the cutout images (encoded
+        image files with the encode setting) if the output_dir setting is
+        None
+        error: error message if the status is 'error'
+        time: processing time in seconds
+        boards: only with the multi_board setting, the results of every
+        board (see seperate_boards), the status is the worst status of
+        all boards
+    """
+    begin = time.time()
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    result = {'file': name, 'status': 'error', 'quality': None,
+              'rectangles': [], 'cutouts': [], 'error': None, 'time': 0.0}
+    with cv2_threads(settings['cv2_threads']):
+        try:
+            if img is None:
+                Metrics.inc('stage_failures_total', stage='load')
+                raise ValueError("image could not be read")
+            if img.shape[:2] != (1000, 1500):
+                if settings['remap'] and source is None:
+                    # the cells are remapped from the unresized image
+                    source = img
+                with Metrics.stage('resize'):
+                    img = cv2.resize(img, (1500, 1000))
+            if settings['multi_board']:
+                result['boards'] = seperate_boards(img, settings, source, budget)
+                statuses = [board['status'] for board in result['boards']]
+                errors = ["board {}: {}".format(i, board['error'])
+                          for i, board in enumerate(result['boards'])
+                          if board['error']]
+                result['error'] = '; '.join(errors) or None
+                for status in ('error', 'rejected', 'ok'):
+                    if status in statuses:
+                        result['status'] = status
+                        break
+            else:
+                # Find paper and resize
+                with Metrics.stage('board'):
+                    paper = find_paper(img)
+                result.update(process_board(img, paper, settings, source, budget))
+        except Exception as e:
+            result['error'] = str(e)
+            print('error:')
+            print(str(e))
+    result['time'] = float(time.time()-begin)
+    Metrics.inc('images_total', status=result['status'])
+    Metrics.observe('image_seconds', result['time'])
+    return result
+
+
+def seperate_the_objects(fileName, settings:dict=None)->dict:
+    """
+    seperates the rectangle shapes from the game board image
+
+    Parameters
+    ----------
+    fileName : str, bytes, memoryview, mmap or np.array
+        path of the board game image, or any other source of load_image
+    settings : dict, optional
+        values that overwrite the DEFAULT_SETTINGS, by default None
+
+    Returns
+    -------
+    dict
+        result of the pipeline, see seperate_image
+    """
+    begin = time.time()
+    name = os.fspath(fileName) if isinstance(fileName, (str, os.PathLike)) \
+        else None
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    if settings['max_memory']:
+        return seperate_large_image(fileName, settings, name)
+    #Read in image and rezize
+    try:
+        with Metrics.stage('load'):
+            img = open_source(fileName, settings['raw_shape'])
+    except (OSError, ValueError) as e:
+        return source_error(name, e, begin)
+    result = seperate_image(img, settings, name)
+    result['time'] = float(time.time()-begin)
+    print(result['time'])
+    return result
+
+
+def source_error(name:str, error:Exception, begin:float)->dict:
+    """result of an image that could not be opened"""
+    Metrics.inc('images_total', status='error')
+    print('error:')
+    print(str(error))
+    return {'file': name, 'status': 'error', 'quality': None,
+            'rectangles': [], 'cutouts': [], 'error': str(error),
+            'time': float(time.time()-begin)}
+
+
+def seperate_large_image(fileName, settings:dict=None, name:str=None)->dict:
+    """
+    memory bounded version of seperate_the_objects for very high resolution
+    scans. The board is found on a 1500x1000 proxy that is built strip by
+    strip, then only the tile of every cell is read from the source and
+    warped in full resolution. The max_memory setting limits the bytes of
+    the proxy plus the strip or the tiles that are read at the same time.
+    Only memory-mapped .npy and .raw files and numpy images are accepted,
+    other files would be decoded completely.
+
+    Parameters
+    ----------
+    fileName : str or np.array
+        path of a .npy or .raw file, or a BGR image
+    settings : dict, optional
+        values that overwrite the DEFAULT_SETTINGS, by default None
+    name : str, optional
+        name of the image in the result, by default None
+
+    Returns
+    -------
+    dict
+        result of the pipeline, see seperate_image
+    """
+    begin = time.time()
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    try:
+        with Metrics.stage('load'):
+            if not is_mapped_source(fileName):
+                raise ValueError("the memory bounded mode needs a .npy or .raw "
+                                 "file or a numpy image, other sources are "
+                                 "decoded as a whole")
+            source = open_source(fileName, settings['raw_shape'])
+            if source is None:
+                raise ValueError("image could not be read")
+            # the proxy is kept until the end, strips and tiles get the rest
+            free = int(settings['max_memory']*2**20) - 1500*1000*3
+            if free <= 0:
+                raise ValueError("the 1500x1000 proxy needs 4.3 MB, more than "
+                                 "the memory limit")
+            proxy = build_proxy(source, free)
+    except (OSError, ValueError) as e:
+        return source_error(name, e, begin)
+    result = seperate_image(proxy, settings, name, source, MemoryBudget(free))
+    result['time'] = float(time.time()-begin)
+    print(result['time'])
+    return result
+
 # =========================================================================== #
 #  SECTION: Main Body                                                         
 # =========================================================================== #
 
 if __name__ == '__main__':
-    seperate_the_objects(FILENAME)
+    import BatchRunner
+    BatchRunner.main()
     
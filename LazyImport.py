@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2021-04-14 14:57:35
+# @Author  : Tom Brandherm (s_brandherm19@stud.hwr-berlin.de)
+# @Link    : link
+# @Version : 1.0.0
+"""
+import heavy modules (cv2, numpy) on their first use instead of at import time
+"""
+# =========================================================================== #
+#  Copyright 2021 Team Awesome
+# =========================================================================== #
+#  All Rights Reserved.
+#  The information contained herein is confidential property of Team Awesome.
+#  The use, copying, transfer or disclosure of such information is prohibited
+#  except by express written agreement with Team Awesome.
+# =========================================================================== #
+
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+# standard:
+import importlib
+import importlib.util
+import sys
+import threading
+import types
+# =========================================================================== #
+#  SECTION: Class definitions
+# =========================================================================== #
+class LazyModule(types.ModuleType):
+    """
+    stand-in for a module that is imported on the first attribute access.
+    The import runs under a lock, so threads that use the module for the
+    first time at once all wait for the completely executed module. Its
+    attributes are then copied into the stand-in, later accesses are as fast
+    as on the module itself. Only the real module is registered in
+    sys.modules.
+    """
+    def __init__(self, name:str):
+        super().__init__(name)
+        self.__lock = threading.Lock()
+        self.__module = None
+
+    def __getattr__(self, attribute:str):
+        # only called for attributes that are not copied (yet)
+        with self.__lock:
+            if self.__module is None:
+                module = importlib.import_module(self.__name__)
+                self.__dict__.update(module.__dict__)
+                self.__module = module
+        return getattr(self.__module, attribute)
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def lazy_import(name:str):
+    """
+    create a module that is imported on the first attribute access. An
+    already imported module is returned as it is.
+
+    Parameters
+    ----------
+    name : str
+        name of the module
+
+    Returns
+    -------
+    module
+        the imported module or a LazyModule
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    return LazyModule(name)
+
+# =========================================================================== #
+#  SECTION: Main Body
+# =========================================================================== #
+
+if __name__ == '__main__':
+    pass
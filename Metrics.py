@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2021-04-14 14:57:35
+# @Author  : Tom Brandherm (s_brandherm19@stud.hwr-berlin.de)
+# @Link    : link
+# @Version : 1.0.0
+"""
+counters and latency histograms of the pipeline, kept in an in-process
+registry and exported as Prometheus text or JSON
+"""
+# =========================================================================== #
+#  Copyright 2021 Team Awesome
+# =========================================================================== #
+#  All Rights Reserved.
+#  The information contained herein is confidential property of Team Awesome.
+#  The use, copying, transfer or disclosure of such information is prohibited
+#  except by express written agreement with Team Awesome.
+# =========================================================================== #
+
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+# standard:
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+# =========================================================================== #
+#  SECTION: Global definitions
+# =========================================================================== #
+# prefix of all metric names
+PREFIX = "cropper_"
+
+# upper bounds of the latency histograms in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+# upper bounds of the dots per board histogram (red dots found on one board)
+DOT_BUCKETS = (0, 2, 4, 8, 12, 16, 24, 32, 64, 128)
+
+# =========================================================================== #
+#  SECTION: Class definitions
+# =========================================================================== #
+class Registry:
+    """
+    thread safe store of counters and histograms. Every metric is identified
+    by its name and its labels.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key: (name, labels), value: number
+        self.counters = dict()
+        # key: (name, labels), value: [bucket bounds, bucket counts, sum]
+        self.histograms = dict()
+
+    def inc(self, name:str, value:float=1, **labels):
+        """
+        increase a counter
+
+        Parameters
+        ----------
+        name : str
+            name of the counter without PREFIX
+        value : float, optional
+            increment, by default 1
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name:str, value:float, buckets:tuple=LATENCY_BUCKETS,
+                **labels):
+        """
+        add a value to a histogram
+
+        Parameters
+        ----------
+        name : str
+            name of the histogram without PREFIX
+        value : float
+            observed value, e.g. a latency in seconds
+        buckets : tuple, optional
+            sorted upper bounds of the buckets, only used by the first
+            observation, by default LATENCY_BUCKETS
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = [tuple(buckets), [0]*(len(buckets)+1), 0.0]
+                self.histograms[key] = histogram
+            # the last count is the +Inf bucket
+            histogram[1][bisect.bisect_left(histogram[0], value)] += 1
+            histogram[2] += value
+
+    def snapshot(self, reset:bool=False)->dict:
+        """
+        copy of all metrics that can be converted to JSON
+
+        Parameters
+        ----------
+        reset : bool, optional
+            remove all metrics from the registry, by default False
+
+        Returns
+        -------
+        dict
+            counters: list of dicts with name, labels and value
+            histograms: list of dicts with name, labels, buckets, counts
+            (per bucket, the last one is +Inf), sum and count
+        """
+        with self.lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in self.counters.items()]
+            histograms = [{'name': name, 'labels': dict(labels),
+                           'buckets': list(bounds), 'counts': list(counts),
+                           'sum': total, 'count': sum(counts)}
+                          for (name, labels), (bounds, counts, total)
+                          in self.histograms.items()]
+            if reset:
+                self.counters.clear()
+                self.histograms.clear()
+        return {'counters': counters, 'histograms': histograms}
+
+    def merge(self, snapshot:dict):
+        """
+        add the metrics of another registry, e.g. of a worker process
+
+        Parameters
+        ----------
+        snapshot : dict
+            result of snapshot of the other registry
+        """
+        with self.lock:
+            for counter in snapshot['counters']:
+                key = (counter['name'], tuple(sorted(counter['labels'].items())))
+                self.counters[key] = self.counters.get(key, 0) + counter['value']
+            for other in snapshot['histograms']:
+                key = (other['name'], tuple(sorted(other['labels'].items())))
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = [tuple(other['buckets']),
+                                 [0]*len(other['counts']), 0.0]
+                    self.histograms[key] = histogram
+                if list(histogram[0]) != list(other['buckets']):
+                    raise ValueError(f"buckets of {other['name']} differ")
+                for i, count in enumerate(other['counts']):
+                    histogram[1][i] += count
+                histogram[2] += other['sum']
+
+    def to_json(self)->str:
+        """all metrics as JSON, see snapshot"""
+        return json.dumps(self.snapshot(), indent=1)
+
+    def to_prometheus(self)->str:
+        """all metrics in the Prometheus text format"""
+        snapshot = self.snapshot()
+        lines = list()
+        typed = set()
+        for counter in sorted(snapshot['counters'], key=lambda c: c['name']):
+            name = PREFIX + counter['name']
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{format_labels(counter['labels'])} "
+                         f"{counter['value']}")
+        for histogram in sorted(snapshot['histograms'],
+                                key=lambda h: h['name']):
+            name = PREFIX + histogram['name']
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            labels = histogram['labels']
+            cumulative = 0
+            bounds = [str(bound) for bound in histogram['buckets']] + ['+Inf']
+            for bound, count in zip(bounds, histogram['counts']):
+                cumulative += count
+                lines.append(f"{name}_bucket"
+                             f"{format_labels({**labels, 'le': bound})} "
+                             f"{cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{format_labels(labels)} "
+                         f"{histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+class NullRegistry(Registry):
+    """registry that drops every value, disables the metrics"""
+    def inc(self, name:str, value:float=1, **labels):
+        pass
+
+    def observe(self, name:str, value:float, buckets:tuple=LATENCY_BUCKETS,
+                **labels):
+        pass
+
+
+class FileExporter:
+    """
+    write the metrics into a file, at most once per interval. Files ending
+    with .json get JSON, all others the Prometheus text format (e.g. for the
+    textfile collector of the node exporter).
+    """
+    def __init__(self, path:str, interval:float=10.0):
+        self.path = path
+        self.interval = interval
+        self.last = None
+
+    def export(self, force:bool=False):
+        """
+        write the file if the interval is over
+
+        Parameters
+        ----------
+        force : bool, optional
+            write the file in any case, by default False
+        """
+        now = time.monotonic()
+        if not force and self.last is not None \
+                and now - self.last < self.interval:
+            return
+        self.last = now
+        dump(self.path)
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def format_labels(labels:dict)->str:
+    """labels in the Prometheus text format"""
+    if not labels:
+        return ''
+    text = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels.items())
+    return '{' + text + '}'
+
+
+def get_registry()->Registry:
+    """registry that collects the metrics of the pipeline"""
+    return REGISTRY
+
+
+def set_registry(registry:Registry):
+    """
+    replace the registry, e.g. by NullRegistry or an own implementation
+    with the methods inc, observe and snapshot
+
+    Parameters
+    ----------
+    registry : Registry
+        new registry
+    """
+    global REGISTRY
+    REGISTRY = registry
+
+
+def inc(name:str, value:float=1, **labels):
+    """increase a counter of the current registry, see Registry.inc"""
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name:str, value:float, buckets:tuple=LATENCY_BUCKETS, **labels):
+    """add a value to a histogram of the current registry, see
+    Registry.observe"""
+    REGISTRY.observe(name, value, buckets, **labels)
+
+
+@contextlib.contextmanager
+def stage(name:str):
+    """
+    measure the latency of a pipeline stage (histogram stage_seconds) and
+    count its failures (counter stage_failures_total)
+
+    Parameters
+    ----------
+    name : str
+        name of the stage
+    """
+    begin = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        REGISTRY.inc('stage_failures_total', stage=name)
+        raise
+    finally:
+        REGISTRY.observe('stage_seconds', time.perf_counter()-begin,
+                         stage=name)
+
+
+def dump(path:str):
+    """
+    write all metrics into a file, Prometheus text or JSON (.json). The file
+    is replaced at once, so a reader never sees a half written file.
+
+    Parameters
+    ----------
+    path : str
+        path of the file
+    """
+    if path.lower().endswith('.json'):
+        text = REGISTRY.to_json()
+    else:
+        text = REGISTRY.to_prometheus()
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    temp = path + ".{}.tmp".format(os.getpid())
+    with open(temp, 'w', encoding='utf-8') as file:
+        file.write(text)
+    os.replace(temp, path)
+
+
+# registry of this process
+REGISTRY = Registry()
+
+# =========================================================================== #
+#  SECTION: Main Body
+# =========================================================================== #
+
+if __name__ == '__main__':
+    pass
@@ -20,11 +20,14 @@ Class for analysing the shape of a random number and position of found points.
 #  SECTION: Imports
 # =========================================================================== #
 # standard:
-import numpy as np
-import math
+from __future__ import annotations
 
 # local:
+from LazyImport import lazy_import
 import StraightLineEquation as sle
+
+# numpy is loaded on the first use, importing the geometry stays light
+np = lazy_import('numpy')
 # =========================================================================== #
 #  SECTION: Global definitions
 # =========================================================================== #
@@ -32,12 +35,79 @@ import StraightLineEquation as sle
 MINIMAL_DISTANCE = 100
 # amount of red dots in one horizantal line
 DOTS_IN_LINE = 6
+# amount of horizontal lines of red dots
+LINES = 3
 
 # =========================================================================== #
 #  SECTION: Class definitions
 # =========================================================================== #
 
 
+class PointSet(object):
+    """
+    Set of 2D points stored in one contiguous (N,2) float32 array. Every
+    stage of the pipeline passes the dots in this form, so no point is boxed
+    into a tuple on the way.
+    """
+    __slots__ = ('points',)
+
+    # ----------------------------------------------------------------------- #
+    #  SUBSECTION: Constructor
+    # ----------------------------------------------------------------------- #
+
+    def __init__(self, points=None):
+        """
+        Parameters
+        ----------
+        points : PointSet, np.array, list or dict, optional
+            (N,2) coordinates, a list of (x,y) tuples or the dict
+            {number: (x,y)} of older versions, by default no points
+        """
+        if isinstance(points, PointSet):
+            points = points.points
+        elif isinstance(points, dict):
+            points = list(points.values())
+        if points is None or len(points) == 0:
+            self.points = np.empty((0, 2), np.float32)
+        else:
+            self.points = np.ascontiguousarray(
+                points, dtype=np.float32).reshape(-1, 2)
+
+    # ----------------------------------------------------------------------- #
+    #  SUBSECTION: Public Methods
+    # ----------------------------------------------------------------------- #
+    def __len__(self):
+        return len(self.points)
+
+    def __getitem__(self, index):
+        return self.points[index]
+
+    def __iter__(self):
+        return iter(self.points)
+
+    def __array__(self, dtype=None, copy=None):
+        # copy=True always copies, copy=False never (numpy 2 protocol)
+        if copy is False and dtype is not None \
+                and np.dtype(dtype) != self.points.dtype:
+            raise ValueError(f"PointSet of float32 can not be {dtype} "
+                             "without a copy")
+        if dtype is None:
+            return self.points.copy() if copy else self.points
+        return self.points.astype(dtype, copy=bool(copy))
+
+    def __repr__(self):
+        return "PointSet({})".format(self.points.tolist())
+
+    def to_dict(self)->dict:
+        """
+        Returns
+        -------
+        dict
+            {number: (x,y)} like the dots of older versions
+        """
+        return {i: tuple(point) for i, point in enumerate(self.points.tolist())}
+
+
 class Grid(object):
     """
     Grid of coordinates
@@ -47,9 +117,15 @@ class Grid(object):
     #  SUBSECTION: Constructor
     # ----------------------------------------------------------------------- #
 
-    def __init__(self, coordinates:dict):
-        # dict of tuples with (x,y)
-        self.__coordiantes = self.__clustering(coordinates)
+    def __init__(self, coordinates:PointSet, columns:int=DOTS_IN_LINE-1,
+                 rows:int=LINES-1, subpixel:bool=False):
+        # rectangles on the game board
+        self.__columns = columns
+        self.__rows = rows
+        # keep the corners and knots in subpixels instead of whole pixels
+        self.__subpixel = subpixel
+        # centers of the four clusters
+        self.__coordiantes = self.__clustering(PointSet(coordinates))
         # total number of found points
         self.__knots = len(coordinates)
         # corners
@@ -65,78 +141,46 @@ class Grid(object):
     def get_knots(self):
         return self.__knots
 
+    def get_shape(self):
+        return self.__columns, self.__rows
+
     def set_coordinates(self, coordinates):
-        self.__coordiantes = self.__clustering(coordinates)
+        self.__coordiantes = self.__clustering(PointSet(coordinates))
         self.corners = self.__sort_corners()
 
+    def set_corners(self, corners:dict):
+        """use known corners A, B, C and D, e.g. the corners transformed
+        into another image, instead of sorting the found dots"""
+        self.__coordiantes = PointSet([corners[key] for key in 'ABCD'])
+        self.corners = dict(zip('ABCD', self.__coordiantes.points))
+
     # ----------------------------------------------------------------------- #
     #  SUBSECTION: Public Methods
     # ----------------------------------------------------------------------- #
-    def find_rectangles(self)->dict:
+    def find_rectangles(self)->np.array:
         """
         Find the corners of every rectangle on the game board.
         Returns
         -------
-        dict
-            dictionay of lists of corner points for each found rectangle
+        np.array
+            (rows*columns, 4, 2) corner points for each found rectangle,
+            numbered row by row
         """
         # FIRST STEP:
         # Fill the matrix with all the found points in the correct order
         # each element represents one row on the game board
         matrix = self.__calculate_missing_knots()
         # SECOND STEP:
-        # Iterate through the (3x6) matrix to sort the points to
+        # Slice the ((rows+1)x(columns+1)) matrix to sort the points to
         # corners of rectangles
-
-        rectangles = dict()
-        for j in range(2):
-            for i in range(DOTS_IN_LINE-1):
-                rectangle = list()
-                rectangle.append(matrix[j+1][i+1])
-                rectangle.append(matrix[j][i+1])
-                rectangle.append(matrix[j][i])
-                rectangle.append(matrix[j+1][i])
-
-                rectangles[i+5*j] = rectangle
-        return rectangles
+        rectangles = np.stack([matrix[1:, 1:], matrix[:-1, 1:],
+                               matrix[:-1, :-1], matrix[1:, :-1]], axis=2)
+        return rectangles.reshape(-1, 4, 2)
 
 
     # ----------------------------------------------------------------------- #
     #  SUBSECTION: Private Methods
     # ----------------------------------------------------------------------- #
-    def __convert_dict(self):
-        """convert the dict values into a matrix (numpy array)
-        Returns
-        -------
-        [numpy array]
-            numpy array of the dict values
-        """
-        result = self.__coordiantes.values()
-        data = list(result)
-        return np.array(data)
-
-
-    def __calculate_angle(self, vec1, vec2):
-        """calculate the angle between two sensors in degree
-
-        Parameters
-        ----------
-        vec1 : [1D numpy array]
-            vector
-        vec2 : [1D numpy array]
-            vector
-
-        Returns
-        -------
-        [float]
-            angle between the two vectors
-        """
-        unit_vector_vec1 = vec1/np.linalg.norm(vec1)
-        unit_vector_vec2 = vec2/np.linalg.norm(vec2)
-        dot_product = np.dot(unit_vector_vec1, unit_vector_vec2)
-        return math.degrees(np.arccos(dot_product))
-
-
     def __calculate_distances(self):
         """calculate the distance between every point and save it into a distance matrix D
 
@@ -150,18 +194,8 @@ class Grid(object):
                 ...     ...                 ...             ...       ...
                 vecn    d(vecn, vec1)   d(vecn,vec2)        ...     0
         """
-        n = self.__knots
-        #reshape matrix to iterable array, every row represents the x and y coordinate of a red dot
-        matrix = self.__convert_dict().reshape(n, 2)
-        #distance matrix
-        D = np.zeros((n,n))
-        for i, vector1 in enumerate(matrix):
-            for j, vector2 in enumerate(matrix):
-                #euclidean distance between two vectors
-                if i != j:
-                    dist = np.linalg.norm(vector1-vector2)
-                    D[i,j] = dist
-        return D
+        matrix = self.__coordiantes.points.astype(np.float64)
+        return np.linalg.norm(matrix[:, None] - matrix[None, :], axis=2)
 
 
     def __calculate_angles(self):
@@ -177,21 +211,15 @@ class Grid(object):
                 ...     ...                 ...             ...      ...
                 vecn    a(vecn, vec1)   a(vecn,vec2)        ...     0
         """
-        n = self.__knots
-        #reshape matrix to iterable array, every row represents the x and y coordinate of a red dot
-        matrix = self.__convert_dict().reshape(n, 2)
-        #angle matrix
-        A = np.zeros((n, n))
-        for i, vector1 in enumerate(matrix):
-            for j, vector2 in enumerate(matrix):
-                #angle between two vectors, unnecessary for same vectors
-                if i != j:
-                    angle = self.__calculate_angle(vector1, vector2)
-                    A[i, j] = angle
+        matrix = self.__coordiantes.points.astype(np.float64)
+        unit_vectors = matrix/np.linalg.norm(matrix, axis=1)[:, None]
+        dot_products = np.clip(unit_vectors @ unit_vectors.T, -1, 1)
+        A = np.degrees(np.arccos(dot_products))
+        np.fill_diagonal(A, 0)
         return A
 
 
-    def __clustering(self, coords: dict) -> dict:
+    def __clustering(self, coords: PointSet) -> PointSet:
         """
         Cluster the coordinates by the distance. Are two ore more coordinates
         in a radial distance range of the given minimal distance there a forming
@@ -199,61 +227,30 @@ class Grid(object):
 
         Parameters
         ----------
-        coords : list
-            list of points
+        coords : PointSet
+            found points
 
         Returns
         -------
-        dict
-            dict of four corner coordintates
+        PointSet
+            four corner coordintates
         """
-        coords = list(coords.values())
-        cluster = {1:[], 2: [], 3:[],4:[]}
-        new_coords = list()
-        for key in range(1,5):
-            for i, coord in enumerate(coords):
-                if i == 0:
-                    cluster[key].append(coord)
-                else:
-                    vector1 = np.asarray(cluster[key][0])
-                    vector2 = np.asarray(coord)
-                    dist = np.linalg.norm(vector1-vector2)
-                    if dist < MINIMAL_DISTANCE:
-                        cluster[key].append(coord)
-                    else:
-                        new_coords.append(coord)
-            coords=new_coords
-            new_coords = []
+        remaining = coords.points
+        cluster = np.empty((4, 2), np.float32)
+        for key in range(4):
+            if len(remaining) == 0:
+                raise ValueError(
+                    f"only {key} of 4 clusters of red dots found")
+            # the first remaining point is the seed of the next cluster
+            dist = np.linalg.norm(remaining - remaining[0], axis=1)
+            in_cluster = dist < MINIMAL_DISTANCE
+            in_cluster[0] = True
             # calculating the mean of the x and the y value of all coordinates
             # in one cluster. the result is one statistical center point
-            cluster[key] = self.__find_center(cluster[key])
-        return cluster
-
-
-    def __find_center(self, coords:list)->tuple:
-        """
-        calculating the mean of the x and y value for a list of tuple coordinates
-
-        Parameters
-        ----------
-        coords : list
-            list of tuple like coordinates
-
-        Returns
-        -------
-        tuple
-            (mean x, mean y)
-        """
-        X = 0
-        Y = 0
-        n = len(coords)
-        for coord in coords:
-            X += coord[0]
-            Y += coord[1]
-
-        mean_X = round(X/n)
-        mean_Y = round(Y/n)
-        return (mean_X, mean_Y)
+            center = remaining[in_cluster].mean(axis=0, dtype=np.float64)
+            cluster[key] = center if self.__subpixel else np.rint(center)
+            remaining = remaining[~in_cluster]
+        return PointSet(cluster)
 
 
     def __sort_corners(self)->dict:
@@ -267,34 +264,36 @@ class Grid(object):
         Returns
         -------
         dict
-            4 corner coordinates
+            4 corner coordinates as rows of the cluster array
         """
         ###### 1.Step
         # find corner C and A by summing up the y and y values and using the one with the
         # biggest sum value for C and the lowest for A
         max_sum_val = 0
         min_sum_val = 0
-        coords = list(self.__coordiantes.values())
-        for coord in coords:
-            sum_value = coord[0] + coord[1]
+        coords = self.__coordiantes.points
+        A = C = None
+        for i, sum_value in enumerate(coords.sum(axis=1).tolist()):
             if sum_value>max_sum_val:
                 max_sum_val=sum_value
                 min_sum_val=sum_value
-                C = coord
+                C = i
             elif sum_value<min_sum_val:
                 min_sum_val=sum_value
-                A = coord
-        coords.remove(A)
-        coords.remove(C)
+                A = i
+        if A is None or C is None:
+            raise ValueError("corners of the grid could not be determined")
+        rest = [i for i in range(len(coords)) if i != A and i != C]
         ###### 2.Step
         # determine B and D
-        if check_inBetween(coords[0][0], A[0]+MINIMAL_DISTANCE, A[0]-MINIMAL_DISTANCE):
-            B = coords[0]
-            D = coords[1]
+        A = coords[A]
+        if check_inBetween(coords[rest[0]][0], A[0]+MINIMAL_DISTANCE, A[0]-MINIMAL_DISTANCE):
+            B = coords[rest[0]]
+            D = coords[rest[1]]
         else:
-            D = coords[0]
-            B = coords[1]
-        return {'A':A,'B':B,'C':C,'D':D}
+            D = coords[rest[0]]
+            B = coords[rest[1]]
+        return {'A':A,'B':B,'C':coords[C],'D':D}
 
 
     def __calculate_missing_knots(self)->np.array:
@@ -305,31 +304,29 @@ class Grid(object):
         Returns
         -------
         np.array
-            3x6 matrix with all coordinates
+            (rows+1, columns+1, 2) matrix with all coordinates
         """
-        # convert the tuple coordinates into numpy arrays
-        vectorA = np.asarray(self.corners['A'])
-        vectorB = np.asarray(self.corners['B'])
-        vectorC = np.asarray(self.corners['C'])
-        vectorD = np.asarray(self.corners['D'])
+        vectorA, vectorB, vectorC, vectorD = (
+            self.corners[key].astype(np.float64) for key in 'ABCD')
         # creating straight line equations out of the given symmetrie
         upper_h = sle.StraightLineEquation(vectorD, vectorA)
         lower_h = sle.StraightLineEquation(vectorC, vectorB)
         left_v = sle.StraightLineEquation(vectorB, vectorA)
         right_v = sle.StraightLineEquation(vectorC, vectorD)
-        middle_h = sle.StraightLineEquation(
-            right_v.calculate(1/2), left_v.calculate(1/2))
+        horizontals = [upper_h]
+        for j in range(1, self.__rows):
+            t = 1 - j/self.__rows
+            horizontals.append(sle.StraightLineEquation(
+                right_v.calculate(t), left_v.calculate(t)))
+        horizontals.append(lower_h)
         # calculating the missing coordinates and putting it into a matrix shape
         # the rows in the matrix are correspond to the horizontal lines in the grid
-        coord_Matrix = [[],[],[]]
-        for i in range(5, -1, -1):
-            x1 = tuple(np.rint(upper_h.calculate(i/5)))
-            coord_Matrix[0].append(x1)
-            x2 = tuple(np.rint(middle_h.calculate(i/5)))
-            coord_Matrix[1].append(x2)
-            x3 = tuple(np.rint(lower_h.calculate(i/5)))
-            coord_Matrix[2].append(x3)
-
+        t = np.arange(self.__columns, -1, -1)/self.__columns
+        coord_Matrix = np.empty(
+            (len(horizontals), self.__columns+1, 2), np.float32)
+        for j, line in enumerate(horizontals):
+            knots = line.calculate(t)
+            coord_Matrix[j] = knots if self.__subpixel else np.rint(knots)
         return coord_Matrix
 # =========================================================================== #
 #  SECTION: Function definitions
@@ -19,9 +19,13 @@ Straight line equation in two dimensional context: vec(f)(t)=vec(a)*t+vec(b)
 # =========================================================================== #
 #  SECTION: Imports                                                           
 # =========================================================================== #
-
+from __future__ import annotations
 import math
-import numpy as np
+
+from LazyImport import lazy_import
+
+# numpy is loaded on the first use, importing the geometry stays light
+np = lazy_import('numpy')
 
 # =========================================================================== #
 #  SECTION: Global definitions
@@ -37,7 +41,9 @@ import numpy as np
 
 
 class StraightLineEquation(object):
-    counter : int = 1
+    __slots__ = ('supportVector', 'directionVector', 'counter')
+    # number of the next created equation
+    instances : int = 1
     # ----------------------------------------------------------------------- #
     #  SUBSECTION: Constructor
     # ----------------------------------------------------------------------- #
@@ -53,80 +59,72 @@ class StraightLineEquation(object):
             end point (x,y)
         """
         # start point is the new support vector
-        self.__supportVector = a
+        self.supportVector = np.asarray(a)
         # calculate direction vector via b - a 
-        self.__directionVector = b-a
+        self.directionVector = np.asarray(b)-self.supportVector
         # increment the instance counter
-        self.counter = StraightLineEquation.counter
-        StraightLineEquation.counter +=1
+        self.counter = StraightLineEquation.instances
+        StraightLineEquation.instances +=1
         
         
     # ----------------------------------------------------------------------- #
     #  SUBSECTION: Getter/Setter
     # ----------------------------------------------------------------------- #
     def get_supportVektor(self):
-        return self.__supportVector
+        return self.supportVector
 
     def get_directionVector(self):
-        return self.__directionVector
+        return self.directionVector
     
 
     def get_equation(self):
         print("New equation: g{0}: x(t)={1}t+{2}".format(self.counter,
-                                                         self.__directionVector, 
-                                                         self.__supportVector))
+                                                         self.directionVector, 
+                                                         self.supportVector))
     # ----------------------------------------------------------------------- #
     #  SUBSECTION: Public Methods
     # ----------------------------------------------------------------------- #
-    def check_points(self, otherPoints:dict, yErr:float)->list:
+    def check_points(self, otherPoints, yErr:float)->np.array:
         """
         Check which of the found points are in line with the two points that are 
         defining the straight line equation
 
         Parameters
         ----------
-        otherPoints : dict
-            dict of all found points with a tuple of x and y coordiantes
+        otherPoints : PointSet or np.array
+            (N,2) x and y coordinates of all found points
         yErr : float
             maximal difference between the y-value of the calculated straight line
             equation and the point
         Returns
         -------
-        list
-            list of bools: the position is linked to the dictionary keys and true if
-            the point is in line 
+        np.array
+            N bools: the position is linked to the order of the points and
+            true if the point is in line 
         """
-        listOfTruth = list()
-        #check which of the points is in that range
-        for key in otherPoints:
-            x = otherPoints[key][0]
-            y = otherPoints[key][1]
-            #error range by shifting the y value of the support vector +/- value
-            yMin, yMax = self.__get_error_range(x, yErr)
-            #check if y value is in that range
-            in_between = yMin <= y and y <= yMax
-            if in_between:
-                listOfTruth.append(True)
-            else:
-                listOfTruth.append(False)
-        return listOfTruth
+        points = np.asarray(otherPoints, dtype=np.float64).reshape(-1, 2)
+        #error range by shifting the y value of the support vector +/- value
+        yMin, yMax = self.__get_error_range(points[:, 0], yErr)
+        #check if y value is in that range
+        return (yMin <= points[:, 1]) & (points[:, 1] <= yMax)
                 
-    def calculate(self, t: float) -> np.array:
+    def calculate(self, t) -> np.array:
         """
         calculate a new point by using the straight line equation
         Parameters
         ----------
-        t : float
-            variable to shift into the direction of the directional vector
+        t : float or np.array
+            variable to shift into the direction of the directional vector,
+            for N values of t the result are N points
 
         Returns
         -------
         np.array
-            calculated point on the line
+            calculated point on the line, (N,2) for N values of t
         """
-        a = self.__directionVector
-        b = self.__supportVector
-        return a*t+b
+        a = self.directionVector
+        b = self.supportVector
+        return np.asarray(t)[..., None]*a+b
 
     def calculate_t(self, x_value:float, a:np.array, b:np.array)->float:
         """
@@ -167,9 +165,9 @@ class StraightLineEquation(object):
         np.array
             new coordinates
         """
-        a1, a2 = self.__seperate_2Dvector(self.__directionVector)
-        b1, b2 = self.__seperate_2Dvector(self.__supportVector)
-        x, y = self.__seperate_2Dvector(refCoord)
+        a1, a2 = self.__seperate_2Dvector(self.directionVector)
+        b1, b2 = self.__seperate_2Dvector(self.supportVector)
+        x, y = self.__seperate_2Dvector(np.asarray(refCoord))
         # calculate the single constants c
         c1 = a1**2 + a2**2
         c2 = (a1*(x-b1)+a2*(y-b2)) / c1
@@ -178,7 +176,7 @@ class StraightLineEquation(object):
         # calculate t from the pq-formula
         t = c2 + np.sqrt(c4)
         # calculate the new coordinates out of the calculated t
-        return self.calculation(t, self.__directionVector, self.__supportVector)
+        return self.calculate(t)
         
 
     # ----------------------------------------------------------------------- #
@@ -206,15 +204,15 @@ class StraightLineEquation(object):
         return angle_in_degrees
 
     
-    def __get_error_range(self, x:float, yErr:float)->tuple:
+    def __get_error_range(self, x, yErr:float)->tuple:
         """
         calculate the upper and lower y value to know if the analaysed 
         point is into the acceptable range or not.
 
         Parameters
         ----------
-        x : float
-            x value of the analysed point
+        x : float or np.array
+            x value of the analysed points
         yErr : float
             defined acceptable y error range 
 
@@ -225,19 +223,17 @@ class StraightLineEquation(object):
         """
         shift = np.asarray((0, yErr))
         # shifting the support vector in both directions
-        upper_supportVector = self.__supportVector + shift
-        lower_supportVector = self.__supportVector - shift
+        upper_supportVector = self.supportVector + shift
+        lower_supportVector = self.supportVector - shift
         # calculate the upper t value 
         tMax = self.calculate_t(
-            x, self.__directionVector, upper_supportVector)
+            x, self.directionVector, upper_supportVector)
         # use the upper t value to calculate the upper y value for the range
-        yMax = self.calculation(
-            tMax, self.__directionVector, upper_supportVector)[1]
+        yMax = self.directionVector[1]*tMax + upper_supportVector[1]
         # same for lower t and y
         tMin = self.calculate_t(
-            x, self.__directionVector, lower_supportVector)
-        yMin = self.calculation(
-            tMin, self.__directionVector, lower_supportVector)[1]
+            x, self.directionVector, lower_supportVector)
+        yMin = self.directionVector[1]*tMin + lower_supportVector[1]
         return yMin, yMax
 
     def __seperate_2Dvector(self, vector:np.array)->tuple:
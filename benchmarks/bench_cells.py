@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+single image latency of the cell processing with one thread compared to the
+shared cell pool
+
+usage: python benchmarks/bench_cells.py [-n REPEAT] [--grid 10x6]
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+# standard:
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# local:
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import CropperTool
+from bench_service import make_board
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def bench(img, settings:dict, n:int)->float:
+    latencies = list()
+    for i in range(n):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = CropperTool.seperate_image(img, settings)
+        latencies.append(time.perf_counter()-start)
+    assert result['status'] == 'ok', result['error'] or result['quality']
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--repeat', type=int, default=10)
+    parser.add_argument('--grid', default='10x6')
+    args = parser.parse_args()
+    columns, rows = (int(n) for n in args.grid.split('x'))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "board.png")
+        make_board(path, columns, rows)
+        img = CropperTool.read_image(path)
+    cores = os.cpu_count() or 1
+    for rectify in (False, True):
+        base = {'output_dir': None, 'encode': True, 'columns': columns,
+                'rows': rows, 'rectify': rectify}
+        serial = bench(img, {**base, 'cell_threads': 1}, args.repeat)
+        pooled = bench(img, {**base, 'cell_threads': cores, 'cv2_threads': 1},
+                       args.repeat)
+        print(f"rectify={rectify!s:<5}  1 thread {serial*1000:7.1f} ms  "
+              f"{cores} threads {pooled*1000:7.1f} ms  "
+              f"speedup {serial/pooled:4.2f}")
+
+# =========================================================================== #
+#  SECTION: Main Body
+# =========================================================================== #
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+cold import time of the modules and the heavy modules they load. Fails if
+the geometry modules load cv2 or numpy at import time.
+
+usage: python benchmarks/bench_import.py [-r REPEAT]
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+# standard:
+import argparse
+import json
+import os
+import subprocess
+import sys
+# =========================================================================== #
+#  SECTION: Global definitions
+# =========================================================================== #
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module: heavy modules that must not be loaded by importing it
+MODULES = {
+    'StraightLineEquation': ('cv2', 'numpy'),
+    'ShapeAnalysis': ('cv2', 'numpy'),
+    'Metrics': ('cv2', 'numpy'),
+    'CropperTool': ('cv2',),
+    'CropperService': ('cv2',),
+    'BatchRunner': ('cv2',),
+}
+HEAVY = ('cv2', 'numpy')
+
+# measured in a fresh interpreter, lazy modules are only registered in
+# sys.modules by their first use
+PROBE = """
+import json, sys, time
+begin = time.perf_counter()
+import {module}
+duration = time.perf_counter() - begin
+loaded = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{'time': duration, 'loaded': loaded}}))
+"""
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def measure(module:str)->dict:
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY)],
+        cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main()->int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+    failed = False
+    for module, forbidden in MODULES.items():
+        runs = [measure(module) for i in range(args.repeat)]
+        best = min(run['time'] for run in runs)
+        loaded = runs[0]['loaded']
+        leaks = [name for name in loaded if name in forbidden]
+        failed = failed or bool(leaks)
+        print(f"{module:<22} {best*1000:8.1f} ms  loaded: "
+              f"{', '.join(loaded) or '-'}{'  FAILED' if leaks else ''}")
+    return 1 if failed else 0
+
+# =========================================================================== #
+#  SECTION: Main Body
+# =========================================================================== #
+
+if __name__ == '__main__':
+    sys.exit(main())
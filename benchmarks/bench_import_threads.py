@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+first use of the lazy modules (LazyImport) by many threads at once, in a
+fresh interpreter per run. Fails if a thread sees a half imported numpy or
+cv2, e.g. "module 'numpy' has no attribute 'ascontiguousarray'".
+
+usage: python benchmarks/bench_import_threads.py [-r REPEAT] [-t THREADS]
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+# standard:
+import argparse
+import json
+import os
+import subprocess
+import sys
+# =========================================================================== #
+#  SECTION: Global definitions
+# =========================================================================== #
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# numpy is first used by the geometry (PointSet), cv2 by the pipeline
+# (seperate_image on a board drawn with numpy). All threads start together.
+PROBE = """
+import concurrent.futures, json, threading, time
+import ShapeAnalysis
+
+def first_use(function, threads):
+    barrier = threading.Barrier(threads)
+    def run():
+        barrier.wait()
+        return function()
+    begin = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        futures = [executor.submit(run) for i in range(threads)]
+        errors = list()
+        for future in futures:
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append(repr(e))
+            else:
+                if isinstance(result, dict) and result['status'] != 'ok':
+                    errors.append(str(result['error']))
+    return {{'time': time.perf_counter()-begin, 'errors': errors}}
+
+numpy = first_use(lambda: ShapeAnalysis.PointSet([[1, 2], [3, 4]]), {threads})
+
+import CropperTool
+np = CropperTool.np
+img = np.full((1000, 1500, 3), (60, 110, 160), np.uint8)
+img[150:850, 200:1300] = 245
+for x in np.linspace(300, 1200, 6).astype(int):
+    img[250:750, x-1:x+2] = 30
+for y in np.linspace(250, 750, 3).astype(int):
+    img[y-1:y+2, 300:1200] = 30
+yy, xx = np.mgrid[:1000, :1500]
+for x, y in [(300, 250), (1200, 250), (300, 750), (1200, 750)]:
+    img[(xx-x)**2 + (yy-y)**2 <= 16] = (40, 20, 220)
+settings = {{'output_dir': None, 'threads': 1}}
+cv2 = first_use(lambda: CropperTool.seperate_image(img, settings), {threads_cv2})
+print(json.dumps({{'numpy': numpy, 'cv2': cv2}}))
+"""
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def measure(threads:int)->dict:
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(threads=threads,
+                                            threads_cv2=max(threads//2, 1))],
+        cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main(argv:list=None)->int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('-t', '--threads', type=int, default=16)
+    args = parser.parse_args(argv)
+    failed = False
+    for i in range(args.repeat):
+        run = measure(args.threads)
+        for module in ('numpy', 'cv2'):
+            errors = run[module]['errors']
+            failed = failed or bool(errors)
+            print(f"run {i} {module:<6} {run[module]['time']*1000:8.1f} ms  "
+                  f"{'FAILED: ' + errors[0] if errors else 'ok'}")
+    return 1 if failed else 0
+
+# =========================================================================== #
+#  SECTION: Main Body
+# =========================================================================== #
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+latency and throughput of the worker mode (CropperTool.py --serve) compared
+to starting CropperTool.py once per image
+
+usage: python benchmarks/bench_service.py [-n REQUESTS]
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+# standard:
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+# =========================================================================== #
+#  SECTION: Global definitions
+# =========================================================================== #
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "CropperTool.py")
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def make_board(path:str, columns:int=5, rows:int=2):
+    """draw a game board of columns x rows rectangles with four red corner
+    dots"""
+    img = np.full((1000, 1500, 3), (60, 110, 160), np.uint8)
+    cv2.rectangle(img, (200, 150), (1300, 850), (245, 245, 245), -1)
+    for x in np.linspace(300, 1200, columns+1).astype(int).tolist():
+        cv2.line(img, (x, 250), (x, 750), (30, 30, 30), 3)
+    for y in np.linspace(250, 750, rows+1).astype(int).tolist():
+        cv2.line(img, (300, y), (1200, y), (30, 30, 30), 3)
+    for corner in [(300, 250), (1200, 250), (300, 750), (1200, 750)]:
+        cv2.circle(img, corner, 4, (40, 20, 220), -1)
+    cv2.imwrite(path, img)
+
+
+def report(name:str, latencies:list, total:float):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies)-1, int(len(latencies)*0.95))]
+    print(f"{name:<12} mean {statistics.mean(latencies)*1000:8.1f} ms  "
+          f"p50 {statistics.median(latencies)*1000:8.1f} ms  "
+          f"p95 {p95*1000:8.1f} ms  "
+          f"{len(latencies)/total:7.2f} images/s")
+
+
+def bench_per_process(image:str, outputDir:str, n:int):
+    latencies = list()
+    begin = time.perf_counter()
+    for i in range(n):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, SCRIPT, image, '-o', outputDir,
+                        '-j', '1', '--force'],
+                       check=True, stdout=subprocess.DEVNULL)
+        latencies.append(time.perf_counter()-start)
+    report("per-process", latencies, time.perf_counter()-begin)
+
+
+def bench_service(image:str, outputDir:str, n:int):
+    worker = subprocess.Popen([sys.executable, SCRIPT, '--serve'],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True)
+    request = json.dumps({'path': image, 'settings': {'output_dir': outputDir}})
+    # the first response includes the start of the worker
+    worker.stdin.write(request + '\n')
+    worker.stdin.flush()
+    json.loads(worker.stdout.readline())
+    latencies = list()
+    begin = time.perf_counter()
+    for i in range(n):
+        start = time.perf_counter()
+        worker.stdin.write(request + '\n')
+        worker.stdin.flush()
+        response = json.loads(worker.stdout.readline())
+        latencies.append(time.perf_counter()-start)
+    total = time.perf_counter()-begin
+    worker.stdin.close()
+    worker.wait()
+    assert response['status'] == 'ok', response
+    report("service", latencies, total)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--requests', type=int, default=20)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as folder:
+        image = os.path.join(folder, "board.png")
+        make_board(image)
+        outputDir = os.path.join(folder, "cutouts")
+        bench_per_process(image, outputDir, args.requests)
+        bench_service(image, outputDir, args.requests)
+
+# =========================================================================== #
+#  SECTION: Main Body
+# =========================================================================== #
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+synthetic game board images for the golden output tests, drawn the same way
+on every platform
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import cv2
+import numpy as np
+# =========================================================================== #
+#  SECTION: Global definitions
+# =========================================================================== #
+# red of the dots inside of the default HSV range
+DOT_RED = (40, 20, 220)
+# red with the hue 3, outside of the default HSV range
+ORANGE_RED = (30, 45, 200)
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def draw_board(columns:int=5, rows:int=2, dot:tuple=DOT_RED,
+               brightness:float=1.0, size:tuple=(1500, 1000))->np.array:
+    """
+    game board of columns x rows rectangles with four red corner dots on a
+    white paper in front of a brown table
+
+    Parameters
+    ----------
+    columns : int, optional
+        rectangles in one row, by default 5
+    rows : int, optional
+        rows of rectangles, by default 2
+    dot : tuple, optional
+        BGR color of the dots, by default DOT_RED
+    brightness : float, optional
+        factor of all colors, by default 1.0
+    size : tuple, optional
+        (width, height) of the image, by default (1500, 1000)
+
+    Returns
+    -------
+    np.array
+        BGR image
+    """
+    img = np.full((1000, 1500, 3), (60, 110, 160), np.uint8)
+    cv2.rectangle(img, (200, 150), (1300, 850), (245, 245, 245), -1)
+    for x in np.linspace(300, 1200, columns+1).astype(int).tolist():
+        cv2.line(img, (x, 250), (x, 750), (30, 30, 30), 3)
+    for y in np.linspace(250, 750, rows+1).astype(int).tolist():
+        cv2.line(img, (300, y), (1200, y), (30, 30, 30), 3)
+    for corner in [(300, 250), (1200, 250), (300, 750), (1200, 750)]:
+        cv2.circle(img, corner, 4, dot, -1)
+    if brightness != 1.0:
+        img = (img*brightness).astype(np.uint8)
+    if size != (1500, 1000):
+        img = cv2.resize(img, size, interpolation=cv2.INTER_NEAREST)
+    return img
+
+
+def draw_boards()->np.array:
+    """two small game boards next to each other on a dark table"""
+    img = np.full((1000, 1500, 3), (40, 60, 90), np.uint8)
+    for left in (100, 800):
+        cv2.rectangle(img, (left, 250), (left+600, 750), (245, 245, 245), -1)
+        for x in np.linspace(left+100, left+500, 6).astype(int).tolist():
+            cv2.line(img, (x, 350), (x, 650), (30, 30, 30), 2)
+        for y in np.linspace(350, 650, 3).astype(int).tolist():
+            cv2.line(img, (left+100, y), (left+500, y), (30, 30, 30), 2)
+        for corner in [(left+100, 350), (left+500, 350),
+                       (left+100, 650), (left+500, 650)]:
+            cv2.circle(img, corner, 2, DOT_RED, -1)
+    return img
+
+
+# name: (image factory, settings)
+SYNTHETIC = {
+    'board': (draw_board, {}),
+    'board_4x2': (lambda: draw_board(4, 2), {'columns': 4}),
+    'board_large': (lambda: draw_board(size=(3000, 2000)), {}),
+    'board_dark_orange': (
+        lambda: draw_board(dot=ORANGE_RED, brightness=0.7), {}),
+    'two_boards': (draw_boards, {'multi_board': True}),
+}
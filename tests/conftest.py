@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+the modules of the tool are flat files in the root folder of the repository
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.dirname(os.path.abspath(__file__))):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+reference implementation of the geometry: a transcription of the original
+loop based Grid (5x2 rectangles) and StraightLineEquation. The fast paths in
+ShapeAnalysis and StraightLineEquation are compared against it.
+
+The only change is in StraightLineEquation: calculate_coord_in_distance and
+__get_error_range called the non-existent method self.calculation(t, a, b),
+here it is the intended a*t+b.
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+# standard:
+import math
+
+import numpy as np
+# =========================================================================== #
+#  SECTION: Global definitions
+# =========================================================================== #
+MINIMAL_DISTANCE = 100
+DOTS_IN_LINE = 6
+
+# =========================================================================== #
+#  SECTION: Class definitions
+# =========================================================================== #
+class StraightLineEquation(object):
+
+    def __init__(self, a:np.array, b:np.array):
+        self.supportVector = a
+        self.directionVector = b-a
+
+    def calculation(self, t:float, a:np.array, b:np.array)->np.array:
+        return a*t+b
+
+    def check_points(self, otherPoints:dict, yErr:float)->list:
+        listOfTruth = list()
+        for key in otherPoints:
+            x = otherPoints[key][0]
+            y = otherPoints[key][1]
+            yMin, yMax = self.get_error_range(x, yErr)
+            in_between = yMin <= y and y <= yMax
+            if in_between:
+                listOfTruth.append(True)
+            else:
+                listOfTruth.append(False)
+        return listOfTruth
+
+    def calculate(self, t:float)->np.array:
+        a = self.directionVector
+        b = self.supportVector
+        return a*t+b
+
+    def calculate_t(self, x_value:float, a:np.array, b:np.array)->float:
+        return (x_value - b[0])/a[0]
+
+    def calculate_coord_in_distance(self, refCoord:np.array, d:float)->np.array:
+        a1, a2 = self.directionVector.item(0), self.directionVector.item(1)
+        b1, b2 = self.supportVector.item(0), self.supportVector.item(1)
+        x, y = refCoord.item(0), refCoord.item(1)
+        c1 = a1**2 + a2**2
+        c2 = (a1*(x-b1)+a2*(y-b2)) / c1
+        c3 = ((b1-x)**2 + (b2-y)**2 - d**2) / c1
+        c4 = c2**2 - c3
+        t = c2 + np.sqrt(c4)
+        return self.calculation(t, self.directionVector, self.supportVector)
+
+    def get_error_range(self, x:float, yErr:float)->tuple:
+        shift = np.asarray((0, yErr))
+        upper_supportVector = self.supportVector + shift
+        lower_supportVector = self.supportVector - shift
+        tMax = self.calculate_t(x, self.directionVector, upper_supportVector)
+        yMax = self.calculation(
+            tMax, self.directionVector, upper_supportVector)[1]
+        tMin = self.calculate_t(x, self.directionVector, lower_supportVector)
+        yMin = self.calculation(
+            tMin, self.directionVector, lower_supportVector)[1]
+        return yMin, yMax
+
+
+class Grid(object):
+
+    def __init__(self, coordinates:dict):
+        self.coordinates = self.clustering(coordinates)
+        self.knots = len(coordinates)
+        self.corners = self.sort_corners()
+
+    def set_coordinates(self, coordinates:dict):
+        self.coordinates = self.clustering(coordinates)
+        self.corners = self.sort_corners()
+
+    def find_rectangles(self)->dict:
+        matrix = self.calculate_missing_knots()
+        rectangles = dict()
+        for j in range(2):
+            for i in range(DOTS_IN_LINE-1):
+                rectangle = list()
+                rectangle.append(matrix[j+1][i+1])
+                rectangle.append(matrix[j][i+1])
+                rectangle.append(matrix[j][i])
+                rectangle.append(matrix[j+1][i])
+                rectangles[i+5*j] = rectangle
+        return rectangles
+
+    def calculate_angle(self, vec1, vec2):
+        unit_vector_vec1 = vec1/np.linalg.norm(vec1)
+        unit_vector_vec2 = vec2/np.linalg.norm(vec2)
+        dot_product = np.dot(unit_vector_vec1, unit_vector_vec2)
+        return math.degrees(np.arccos(dot_product))
+
+    def calculate_distances(self, matrix:np.array)->np.array:
+        n = len(matrix)
+        D = np.zeros((n, n))
+        for i, vector1 in enumerate(matrix):
+            for j, vector2 in enumerate(matrix):
+                if i != j:
+                    D[i, j] = np.linalg.norm(vector1-vector2)
+        return D
+
+    def calculate_angles(self, matrix:np.array)->np.array:
+        n = len(matrix)
+        A = np.zeros((n, n))
+        for i, vector1 in enumerate(matrix):
+            for j, vector2 in enumerate(matrix):
+                if i != j:
+                    A[i, j] = self.calculate_angle(vector1, vector2)
+        return A
+
+    def clustering(self, coords:dict)->dict:
+        coords = list(coords.values())
+        cluster = {1: [], 2: [], 3: [], 4: []}
+        new_coords = list()
+        for key in range(1, 5):
+            for i, coord in enumerate(coords):
+                if i == 0:
+                    cluster[key].append(coord)
+                else:
+                    vector1 = np.asarray(cluster[key][0])
+                    vector2 = np.asarray(coord)
+                    dist = np.linalg.norm(vector1-vector2)
+                    if dist < MINIMAL_DISTANCE:
+                        cluster[key].append(coord)
+                    else:
+                        new_coords.append(coord)
+            coords = new_coords
+            new_coords = []
+            cluster[key] = self.find_center(cluster[key])
+        return cluster
+
+    def find_center(self, coords:list)->tuple:
+        X = 0
+        Y = 0
+        n = len(coords)
+        for coord in coords:
+            X += coord[0]
+            Y += coord[1]
+        return (round(X/n), round(Y/n))
+
+    def sort_corners(self)->dict:
+        max_sum_val = 0
+        min_sum_val = 0
+        coords = list(self.coordinates.values())
+        for coord in coords:
+            sum_value = coord[0] + coord[1]
+            if sum_value > max_sum_val:
+                max_sum_val = sum_value
+                min_sum_val = sum_value
+                C = coord
+            elif sum_value < min_sum_val:
+                min_sum_val = sum_value
+                A = coord
+        coords.remove(A)
+        coords.remove(C)
+        if check_inBetween(coords[0][0], A[0]+MINIMAL_DISTANCE,
+                           A[0]-MINIMAL_DISTANCE):
+            B = coords[0]
+            D = coords[1]
+        else:
+            D = coords[0]
+            B = coords[1]
+        return {'A': A, 'B': B, 'C': C, 'D': D}
+
+    def calculate_missing_knots(self)->list:
+        vectorA = np.asarray(self.corners['A'])
+        vectorB = np.asarray(self.corners['B'])
+        vectorC = np.asarray(self.corners['C'])
+        vectorD = np.asarray(self.corners['D'])
+        upper_h = StraightLineEquation(vectorD, vectorA)
+        lower_h = StraightLineEquation(vectorC, vectorB)
+        left_v = StraightLineEquation(vectorB, vectorA)
+        right_v = StraightLineEquation(vectorC, vectorD)
+        middle_h = StraightLineEquation(
+            right_v.calculate(1/2), left_v.calculate(1/2))
+        coord_Matrix = [[], [], []]
+        for i in range(5, -1, -1):
+            coord_Matrix[0].append(tuple(np.rint(upper_h.calculate(i/5))))
+            coord_Matrix[1].append(tuple(np.rint(middle_h.calculate(i/5))))
+            coord_Matrix[2].append(tuple(np.rint(lower_h.calculate(i/5))))
+        return coord_Matrix
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def check_inBetween(value:float, upper:float=0, lower:float=0)->bool:
+    return lower <= value <= upper
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+the adaptive red dot detector (adaptive setting): estimated red hues,
+subpixel dot centers and a lattice that keeps them
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import contextlib
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+import boards
+import CropperTool
+import ShapeAnalysis
+# =========================================================================== #
+#  SECTION: Global definitions
+# =========================================================================== #
+# corners of the lattice of boards.draw_board in subpixels
+CORNERS = np.array([[300.4, 250.3], [300.2, 750.6], [1199.7, 750.2],
+                    [1199.6, 249.8]])
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def draw_subpixel_board(dot:tuple=boards.DOT_RED)->np.array:
+    """default board with antialiased dots at the subpixel CORNERS, order
+    A, B, C, D"""
+    img = boards.draw_board(dot=(245, 245, 245))
+    for x, y in CORNERS:
+        cv2.circle(img, (int(round(x*16)), int(round(y*16))), 4*16, dot, -1,
+                   cv2.LINE_AA, shift=4)
+    return img
+
+
+def run(img, **settings)->dict:
+    settings = {'output_dir': None, 'threads': 1, 'cut': False, **settings}
+    with contextlib.redirect_stdout(io.StringIO()):
+        return CropperTool.seperate_image(img, settings)
+
+# =========================================================================== #
+#  SECTION: Tests
+# =========================================================================== #
+def test_red_hue_range_follows_the_dots():
+    # dots of pure red (hue 0 to 2) are outside of the default range 170-180
+    dot = (0, 15, 230)
+    img = draw_subpixel_board(dot=dot)
+    hue = cv2.cvtColor(np.uint8([[dot]]), cv2.COLOR_BGR2HSV)[0, 0, 0]
+    low, high = CropperTool.red_hue_range(cv2.cvtColor(img, cv2.COLOR_BGR2HSV))
+    # the returned hues are shifted by 90
+    assert low <= (hue + 90) % 180 <= high and high - low < 10
+    assert len(CropperTool.find_red_dots(img, False)) == 0
+    assert len(CropperTool.find_red_dots(img, False, adaptive=True)) == 4
+    # without any colored pixel the given range is kept
+    gray = np.full((10, 10, 3), 128, np.uint8)
+    assert CropperTool.red_hue_range(cv2.cvtColor(gray, cv2.COLOR_BGR2HSV)) \
+        == (80, 90)
+
+
+def test_subpixel_centers():
+    points = CropperTool.find_red_dots(draw_subpixel_board(), False,
+                                       adaptive=True)
+    assert len(points) == 4
+    # the default detector truncates the centers to whole pixels
+    for found in (points.points, CropperTool.find_red_dots(
+            draw_subpixel_board(), False).points):
+        distances = np.linalg.norm(found[:, None] - CORNERS[None], axis=2)
+        assert distances.min(axis=1).max() < 1.5
+    distances = np.linalg.norm(points.points[:, None] - CORNERS[None], axis=2)
+    assert distances.min(axis=1).max() < 0.15
+
+
+@pytest.mark.parametrize('factor', [3, 4])
+def test_area_limits_scale_with_the_resolution(factor):
+    img = draw_subpixel_board()
+    large = cv2.resize(img, None, fx=factor, fy=factor,
+                       interpolation=cv2.INTER_LINEAR)
+    # the dots of 50 pixels are larger than MAX_DOT_AREA in these images
+    points = CropperTool.find_red_dots(large, False, adaptive=True)
+    expected = CropperTool.find_red_dots(img, False, adaptive=True)
+    np.testing.assert_allclose(np.sort(points.points, axis=0),
+                               np.sort(expected.points, axis=0), atol=0.5)
+
+
+def test_grid_keeps_subpixels():
+    # in the order of the detector, from the bottom
+    points = ShapeAnalysis.PointSet(CORNERS[::-1])
+    exact = ShapeAnalysis.Grid(points, subpixel=True)
+    rounded = ShapeAnalysis.Grid(points)
+    for key, corner in zip('ABCD', CORNERS):
+        np.testing.assert_allclose(exact.corners[key], corner, atol=1e-4)
+        np.testing.assert_array_equal(rounded.corners[key], np.rint(corner))
+    knots = exact.find_rectangles()
+    assert not np.array_equal(knots, np.rint(knots))
+    # the top right corner of the third cell is at 3/5 from A to D
+    np.testing.assert_allclose(knots[2, 1], (CORNERS[0]*2 + CORNERS[3]*3)/5,
+                               atol=1e-3)
+
+
+def test_adaptive_pipeline_keeps_subpixels():
+    img = draw_subpixel_board()
+    result = run(img, adaptive=True, remap=True)
+    assert result['status'] == 'ok', result['error'] or result['quality']
+    rectangles = np.array(result['rectangles'])
+    assert not np.array_equal(rectangles, np.rint(rectangles))
+    # the default detector rounds to whole pixels
+    rectangles = np.array(run(img)['rectangles'])
+    np.testing.assert_array_equal(rectangles, np.rint(rectangles))
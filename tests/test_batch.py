@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+batch runs of BatchRunner: the command line, the manifest and the
+continuation of a run
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import contextlib
+import io
+import json
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import boards
+import BatchRunner
+# =========================================================================== #
+#  SECTION: Global definitions
+# =========================================================================== #
+# image that kills its worker process
+CRASHING_NAME = "board_3.png"
+# the original, BatchRunner.process_image_metrics is replaced by the tests
+PROCESS_IMAGE_METRICS = BatchRunner.process_image_metrics
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def write_boards(folder, n:int)->list:
+    """n synthetic boards as png files"""
+    paths = list()
+    for i in range(n):
+        path = str(folder/f"board_{i}.png")
+        cv2.imwrite(path, boards.draw_board())
+        paths.append(path)
+    return paths
+
+
+def crashing_process(path:str, settings:dict)->tuple:
+    """process_image_metrics, but the worker of CRASHING_NAME dies like
+    killed by the out of memory killer"""
+    if os.path.basename(path) == CRASHING_NAME:
+        os._exit(1)
+    return PROCESS_IMAGE_METRICS(path, settings)
+
+
+def run(files:list, tmp_path, **kwargs)->list:
+    settings = dict(BatchRunner.CropperTool.DEFAULT_SETTINGS)
+    del settings['output_dir']
+    settings['threads'] = 1
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        results = BatchRunner.run_batch(
+            files, settings, str(tmp_path/"out"), str(tmp_path/"cache"),
+            **kwargs)
+    return results, output.getvalue()
+
+
+def main(*argv:str, workers:int=1)->tuple:
+    """results and printed lines of the command line"""
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        results = BatchRunner.main([*argv, '-j', str(workers)])
+    return results, output.getvalue()
+
+
+def manifest(tmp_path)->list:
+    with open(tmp_path/"cache"/BatchRunner.MANIFEST_NAME) as file:
+        return [json.loads(line) for line in file]
+
+# =========================================================================== #
+#  SECTION: Tests
+# =========================================================================== #
+def test_crashed_worker_is_retried(tmp_path, monkeypatch):
+    files = write_boards(tmp_path, 7)
+    monkeypatch.setattr(BatchRunner, 'process_image_metrics', crashing_process)
+    results, _ = run(files, tmp_path, workers=3)
+    statuses = {os.path.basename(r['file']): r['status'] for r in results}
+    assert statuses.pop(CRASHING_NAME) == 'crashed'
+    assert sorted(statuses.values()) == ['ok']*6
+    # only the image that kills its worker is recorded as crashed
+    assert [e['status'] for e in manifest(tmp_path)].count('crashed') == 1
+
+    # the next run processes only the crashed image
+    monkeypatch.undo()
+    results, output = run(files, tmp_path, workers=3)
+    assert "6 of 7 images already done" in output
+    assert [(os.path.basename(r['file']), r['status']) for r in results] \
+        == [(CRASHING_NAME, 'ok')]
+    results, output = run(files, tmp_path, workers=3)
+    assert results == [] and "7 of 7 images already done" in output
+
+
+def test_collect_images(tmp_path):
+    paths = write_boards(tmp_path, 2)
+    (tmp_path/"notes.txt").write_text("no image")
+    (tmp_path/"sub").mkdir()
+    nested = write_boards(tmp_path/"sub", 1)
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        files = BatchRunner.collect_images(
+            [str(tmp_path), str(tmp_path/"sub"/"*.png"), paths[0],
+             str(tmp_path/"missing.png")])
+    assert files == sorted(paths + nested)
+    assert "skipped" in output.getvalue()
+
+
+def test_command_line_writes_cutouts_and_manifest(tmp_path):
+    (tmp_path/"in").mkdir()
+    files = write_boards(tmp_path/"in", 2)
+    out = tmp_path/"out"
+    results, _ = main(str(tmp_path/"in"), '-o', str(out), '--format', 'png')
+    assert [r['status'] for r in results] == ['ok', 'ok']
+    # the folder structure below the inputs is kept
+    for path in files:
+        name = os.path.splitext(os.path.basename(path))[0]
+        cutouts = sorted(os.listdir(out/name))
+        assert cutouts == sorted(f"roi{i}.png" for i in range(10))
+    entries = [json.loads(line) for line in open(out/".cache"/"manifest.jsonl")]
+    assert sorted(e['file'] for e in entries) == files
+    assert all(e['settings'] == entries[0]['settings'] for e in entries)
+
+    # done images are skipped, other settings or --force process them again
+    results, output = main(str(tmp_path/"in"), '-o', str(out), '--format', 'png')
+    assert results == [] and "2 of 2 images already done" in output
+    results, _ = main(str(tmp_path/"in"), '-o', str(out), '--grid', '4x2')
+    assert len(results) == 2
+    results, _ = main(str(tmp_path/"in"), '-o', str(out), '--grid', '4x2',
+                      '--force')
+    assert len(results) == 2
+    # a changed file is processed again
+    os.utime(files[0], ns=(0, 0))
+    results, _ = main(str(tmp_path/"in"), '-o', str(out), '--grid', '4x2')
+    assert [r['file'] for r in results] == [files[0]]
+
+
+def test_resume_with_other_threads(tmp_path):
+    (tmp_path/"in").mkdir()
+    files = write_boards(tmp_path/"in", 3)
+    out = str(tmp_path/"out")
+    results, _ = main(files[0], '-o', out, '--remap')
+    assert len(results) == 1
+    # workers, threads and the cache folder do not change the cutouts
+    results, output = main(str(tmp_path/"in"), '-o', out, '--remap',
+                           '--cell-threads', '2', '--cv2-threads', '1',
+                           '--cache', str(tmp_path/"out"/".cache"), workers=2)
+    assert "1 of 3 images already done" in output
+    assert sorted(r['file'] for r in results) == files[1:]
+    results, output = main(str(tmp_path/"in"), '-o', out, '--remap',
+                           '--threads', '2')
+    assert results == [] and "3 of 3 images already done" in output
+    keys = {json.loads(line)['settings']
+            for line in open(tmp_path/"out"/".cache"/"manifest.jsonl")}
+    assert len(keys) == 1
+
+
+def test_errors_are_retried_on_request(tmp_path):
+    path = tmp_path/"blank.png"
+    cv2.imwrite(str(path), np.full((100, 150, 3), 255, np.uint8))
+    out = str(tmp_path/"out")
+    results, _ = main(str(path), '-o', out)
+    assert results[0]['status'] == 'error'
+    assert main(str(path), '-o', out)[0] == []
+    assert len(main(str(path), '-o', out, '--retry-errors')[0]) == 1
+
+
+def test_interrupted_manifest_line_is_ignored(tmp_path):
+    files = write_boards(tmp_path, 1)
+    results, _ = run(files, tmp_path)
+    with open(tmp_path/"cache"/BatchRunner.MANIFEST_NAME, 'a') as file:
+        file.write('{"file": "half written')
+    assert BatchRunner.load_manifest(
+        str(tmp_path/"cache"/BatchRunner.MANIFEST_NAME)).keys() == set(files)
+
+
+@pytest.mark.parametrize('argv', [['--grid', '5'], ['--cell-size', 'big'],
+                                  ['--raw-shape', '10']])
+def test_invalid_arguments(argv):
+    with pytest.raises(SystemExit):
+        main('missing.png', *argv)
+
+
+def test_worker_metrics_are_merged(tmp_path):
+    files = write_boards(tmp_path, 3)
+    metricsPath = tmp_path/"metrics.json"
+    registry = BatchRunner.Metrics.Registry()
+    previous = BatchRunner.Metrics.get_registry()
+    BatchRunner.Metrics.set_registry(registry)
+    try:
+        run(files, tmp_path, workers=2, metricsPath=str(metricsPath))
+    finally:
+        BatchRunner.Metrics.set_registry(previous)
+    counters = {c['name']: c['value'] for c in
+                json.loads(metricsPath.read_text())['counters']
+                if c['labels'] in ({}, {'status': 'ok'})}
+    assert counters['images_total'] == 3
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+the cells of a board on the shared cell pool (cell_threads) give the same
+cutouts as one after another, and the cv2 threads of one image do not stay
+set for the next ones
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import contextlib
+import io
+import os
+
+import numpy as np
+import pytest
+
+import boards
+import CropperTool
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def run(img, **settings)->dict:
+    settings = {'output_dir': None, 'columns': 10, 'rows': 6, **settings}
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = CropperTool.seperate_image(img, settings)
+    assert result['status'] == 'ok', result['error'] or result['quality']
+    return result
+
+# =========================================================================== #
+#  SECTION: Tests
+# =========================================================================== #
+@pytest.fixture(scope='module')
+def board()->np.array:
+    return boards.draw_board(10, 6)
+
+
+@pytest.mark.parametrize('mode', [
+    {}, {'rectify': True}, {'encode': True}, {'adaptive': True, 'remap': True},
+    {'encode': True, 'file_format': 'png', 'rectify': True}])
+def test_cell_threads_give_the_same_cutouts(board, mode):
+    serial = run(board, cell_threads=1, **mode)['cutouts']
+    pooled = run(board, cell_threads=4, cv2_threads=1, **mode)['cutouts']
+    assert len(serial) == len(pooled) == 60
+    for a, b in zip(serial, pooled):
+        assert bytes(a) == bytes(b)
+
+
+def test_cell_threads_save_the_same_files(board, tmp_path):
+    for threads in (1, 4):
+        run(board, cell_threads=threads, file_format='png',
+            output_dir=str(tmp_path/str(threads)))
+    names = sorted(os.listdir(tmp_path/"1"))
+    assert len(names) == 60 and names == sorted(os.listdir(tmp_path/"4"))
+    for name in names:
+        assert (tmp_path/"1"/name).read_bytes() == (tmp_path/"4"/name).read_bytes()
+
+
+def test_cv2_threads_are_restored(board):
+    previous = CropperTool.cv2.getNumThreads()
+    seen = list()
+    resize = CropperTool.cv2.resize
+
+    def spy(*args, **kwargs):
+        seen.append(CropperTool.cv2.getNumThreads())
+        return resize(*args, **kwargs)
+
+    CropperTool.cv2.setNumThreads(3)
+    try:
+        with pytest.MonkeyPatch.context() as patch:
+            patch.setattr(CropperTool.cv2, 'resize', spy)
+            run(np.repeat(np.repeat(board, 2, 0), 2, 1), cv2_threads=1)
+        assert seen and set(seen) == {1}
+        assert CropperTool.cv2.getNumThreads() == 3
+        # an image that fails restores them as well
+        with contextlib.redirect_stdout(io.StringIO()):
+            CropperTool.seperate_image(None, {'cv2_threads': 2})
+        assert CropperTool.cv2.getNumThreads() == 3
+    finally:
+        CropperTool.cv2.setNumThreads(previous)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+property tests of the geometry on random lattices: the vectorised Grid and
+StraightLineEquation give the same results as the original loops in
+reference_geometry, or fail on the same inputs
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import numpy as np
+import pytest
+
+import ShapeAnalysis
+import StraightLineEquation
+import reference_geometry as reference
+# =========================================================================== #
+#  SECTION: Global definitions
+# =========================================================================== #
+# every seed checks CASES random inputs
+SEEDS = range(4)
+CASES = 500
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def random_corners(rng:np.random.Generator)->np.array:
+    """four corners of a distorted board: top left, top right, bottom right,
+    bottom left"""
+    x0, y0 = rng.uniform(20, 400), rng.uniform(20, 300)
+    width, height = rng.uniform(250, 1000), rng.uniform(200, 600)
+    corners = np.array([[x0, y0], [x0+width, y0],
+                        [x0+width, y0+height], [x0, y0+height]])
+    return corners + rng.uniform(-60, 60, corners.shape)
+
+
+def random_points(rng:np.random.Generator, columns:int=5, rows:int=2)->np.array:
+    """
+    red dots as the detector finds them: only the corners, clusters of dots
+    around the corners or a whole lattice, in random order and with whole or
+    subpixel coordinates
+
+    Returns
+    -------
+    np.array
+        (N, 2) float32 points
+    """
+    corners = random_corners(rng)
+    kind = rng.integers(3)
+    if kind == 0:
+        points = corners
+    elif kind == 1:
+        points = np.concatenate([
+            corner + rng.uniform(-25, 25, (rng.integers(1, 4), 2))
+            for corner in corners])
+    else:
+        u, v = np.meshgrid(np.linspace(0, 1, columns+1),
+                           np.linspace(0, 1, rows+1))
+        u, v = u.ravel()[:, None], v.ravel()[:, None]
+        top = corners[0]*(1-u) + corners[1]*u
+        bottom = corners[3]*(1-u) + corners[2]*u
+        points = top*(1-v) + bottom*v + rng.normal(0, 2, (len(u), 2))
+    points = rng.permutation(points)
+    if rng.integers(2):
+        points = np.trunc(points)
+    return points.astype(np.float32)
+
+
+def as_dict(points:np.array)->dict:
+    """points in the dict format of the original implementation"""
+    return {i: tuple(point) for i, point in enumerate(points.tolist())}
+
+
+def reference_grid(points:np.array):
+    """corners and rectangles of the reference, None if it fails"""
+    try:
+        grid = reference.Grid(as_dict(points))
+        rectangles = grid.find_rectangles()
+    except (ArithmeticError, IndexError, NameError, ValueError):
+        return None
+    return grid, np.array([rectangles[key] for key in range(len(rectangles))])
+
+
+def current_grid(points:np.array, columns:int=5, rows:int=2):
+    """corners and rectangles of ShapeAnalysis.Grid, None if it fails"""
+    try:
+        grid = ShapeAnalysis.Grid(ShapeAnalysis.PointSet(points), columns, rows)
+        rectangles = grid.find_rectangles()
+    except ValueError:
+        return None
+    return grid, rectangles
+
+# =========================================================================== #
+#  SECTION: Tests
+# =========================================================================== #
+@pytest.mark.parametrize('seed', SEEDS)
+def test_grid_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    failed = 0
+    for case in range(CASES):
+        points = random_points(rng)
+        expected = reference_grid(points)
+        actual = current_grid(points)
+        assert (expected is None) == (actual is None), points.tolist()
+        if expected is None:
+            failed += 1
+            continue
+        for key in 'ABCD':
+            np.testing.assert_array_equal(
+                actual[0].corners[key], np.array(expected[0].corners[key]))
+        np.testing.assert_array_equal(actual[1], expected[1])
+    # the random boards must mostly be valid, else the test proves little
+    assert failed < CASES/10
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_set_coordinates_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    for case in range(CASES//5):
+        first, second = random_points(rng), random_points(rng)
+        try:
+            expected = reference.Grid(as_dict(first))
+            expected.set_coordinates(as_dict(second))
+            expected = np.array([v for k, v in
+                                 sorted(expected.find_rectangles().items())])
+        except (ArithmeticError, IndexError, NameError, ValueError):
+            expected = None
+        try:
+            actual = ShapeAnalysis.Grid(ShapeAnalysis.PointSet(first))
+            actual.set_coordinates(ShapeAnalysis.PointSet(second))
+            actual = actual.find_rectangles()
+        except ValueError:
+            actual = None
+        assert (expected is None) == (actual is None)
+        if expected is not None:
+            np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_distances_and_angles_match_reference(seed):
+    rng = np.random.default_rng(seed)
+    for case in range(CASES//5):
+        points = random_corners(rng).astype(np.float32)
+        try:
+            grid = ShapeAnalysis.Grid(ShapeAnalysis.PointSet(points))
+        except ValueError:
+            # corners closer than MINIMAL_DISTANCE
+            continue
+        clusters = grid.get_coordinates().points.astype(np.float64)
+        expected = reference.Grid.__new__(reference.Grid)
+        np.testing.assert_allclose(
+            grid._Grid__calculate_distances(),
+            expected.calculate_distances(clusters), rtol=1e-12)
+        np.testing.assert_allclose(
+            grid._Grid__calculate_angles(),
+            expected.calculate_angles(clusters), atol=1e-6)
+
+
+@pytest.mark.parametrize('columns, rows', [(1, 1), (3, 2), (5, 2), (4, 4), (8, 3)])
+def test_rectangles_tile_the_board(columns, rows):
+    rng = np.random.default_rng(columns*10 + rows)
+    for case in range(CASES//5):
+        result = current_grid(random_points(rng, columns, rows), columns, rows)
+        if result is None:
+            continue
+        grid, rectangles = result
+        assert rectangles.shape == (rows*columns, 4, 2)
+        cells = rectangles.reshape(rows, columns, 4, 2)
+        # neighbouring cells share their edges
+        np.testing.assert_array_equal(cells[:, :-1, 1], cells[:, 1:, 2])
+        np.testing.assert_array_equal(cells[:, :-1, 0], cells[:, 1:, 3])
+        np.testing.assert_array_equal(cells[:-1, :, 0], cells[1:, :, 1])
+        np.testing.assert_array_equal(cells[:-1, :, 3], cells[1:, :, 2])
+        # the outer cells end in the rounded corners of the grid
+        outer = {tuple(cells[0, 0, 2]), tuple(cells[0, -1, 1]),
+                 tuple(cells[-1, -1, 0]), tuple(cells[-1, 0, 3])}
+        corners = {tuple(np.rint(grid.corners[key])) for key in 'ABCD'}
+        assert outer == corners
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_check_points_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    for case in range(CASES//5):
+        a, b = rng.uniform(0, 1500, 2), rng.uniform(0, 1500, 2)
+        points = rng.uniform(0, 1500, (20, 2))
+        # some points exactly on the line
+        points[:5] = a + np.outer(rng.uniform(-1, 2, 5), b - a)
+        yErr = rng.uniform(0, 50)
+        expected = reference.StraightLineEquation(a, b).check_points(
+            {i: tuple(p) for i, p in enumerate(points)}, yErr)
+        actual = StraightLineEquation.StraightLineEquation(a, b).check_points(
+            points, yErr)
+        np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_coord_in_distance_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    for case in range(CASES//5):
+        a, b = rng.uniform(0, 1500, 2), rng.uniform(0, 1500, 2)
+        line = StraightLineEquation.StraightLineEquation(a, b)
+        ref = line.calculate(rng.uniform(-1, 2))
+        d = rng.uniform(0, 500)
+        actual = line.calculate_coord_in_distance(ref, d)
+        expected = reference.StraightLineEquation(a, b) \
+            .calculate_coord_in_distance(ref, d)
+        np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=1e-9)
+        # the point is on the line in the given distance
+        assert np.linalg.norm(actual - ref) == pytest.approx(d, abs=1e-6)
+        direction = b - a
+        offset = actual - a
+        cross = direction[0]*offset[1] - direction[1]*offset[0]
+        assert abs(cross) <= 1e-6*np.linalg.norm(direction)*max(
+            np.linalg.norm(offset), 1)
+
+
+def test_calculate_accepts_many_values():
+    line = StraightLineEquation.StraightLineEquation(
+        np.array([1.0, 2.0]), np.array([4.0, 6.0]))
+    t = np.linspace(-1, 2, 7)
+    expected = [reference.StraightLineEquation(
+        np.array([1.0, 2.0]), np.array([4.0, 6.0])).calculate(v) for v in t]
+    np.testing.assert_array_equal(line.calculate(t), expected)
+
+
+def test_point_set_formats_are_equal():
+    points = np.array([[1.5, 2.0], [3.0, 4.25], [5.0, 6.0]])
+    expected = ShapeAnalysis.PointSet(points)
+    for other in (points.tolist(), as_dict(points), expected,
+                  ShapeAnalysis.PointSet(points.astype(np.float32))):
+        actual = ShapeAnalysis.PointSet(other)
+        assert actual.points.dtype == np.float32
+        assert actual.points.flags['C_CONTIGUOUS']
+        np.testing.assert_array_equal(actual.points, expected.points)
+    assert ShapeAnalysis.PointSet(expected.to_dict()).points.tolist() \
+        == expected.points.tolist()
+
+
+def test_point_set_array_copies():
+    points = ShapeAnalysis.PointSet([[1.5, 2.0], [3.0, 4.25]])
+    for array in (np.array(points), np.array(points, np.float32),
+                  np.array(points, np.float64), np.array(points, copy=True)):
+        array[0, 0] = -1
+        assert points.points[0, 0] == 1.5
+    # without a copy the points are shared
+    assert np.asarray(points) is points.points
+    assert np.shares_memory(np.array(points, copy=False), points.points)
+    with pytest.raises(ValueError):
+        np.array(points, np.float64, copy=False)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+golden outputs of the whole pipeline: the dots, corners, rectangles, status
+and cutout hashes of every Testbilder image and of synthetic boards are
+pinned in golden/golden.json. Every cutout of a board that is ok has to lie
+between the drawn lines of its cell.
+
+After an intended change of the results the file is written again with
+
+    python tests/test_golden.py
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+from unittest import mock
+
+import numpy as np
+import pytest
+
+import conftest
+import boards
+import CropperTool
+import ShapeAnalysis
+# =========================================================================== #
+#  SECTION: Global definitions
+# =========================================================================== #
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "golden", "golden.json")
+
+# layout of the Testbilder images, the others have the default 5x2 cells
+PHOTO_SETTINGS = {
+    'test1.png': {'columns': 4},
+    'test2.png': {'columns': 4},
+    'test3.png': {'columns': 4},
+    'test4.png': {'columns': 4},
+    'test5.png': {'columns': 4},
+    'test7.png': {'columns': 4},
+}
+
+# settings of the modes, every image is checked in every mode of its kind
+PHOTO_MODES = {
+    'default': {},
+    'adaptive': {'adaptive': True},
+    'remap': {'adaptive': True, 'remap': True},
+}
+SYNTHETIC_MODES = {
+    'default': {},
+    'adaptive': {'adaptive': True},
+    'rectify': {'adaptive': True, 'rectify': True},
+    'remap': {'adaptive': True, 'remap': True},
+}
+
+# tolerance of the coordinates, the subpixel dots are float32
+ATOL = 1e-3
+
+# a drawn line is a row or column of a cutout with at least LINE_RATIO dark
+# pixels, the outer BORDER_RATIO of every side of a cutout has to contain
+# one, the rest none
+LINE_RATIO = 0.95
+BORDER_LINE_RATIO = 0.5
+BORDER_RATIO = 0.08
+
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def cases()->dict:
+    """
+    all golden cases
+
+    Returns
+    -------
+    dict
+        key: case name, value: (image factory, settings)
+    """
+    result = dict()
+    for path in sorted(glob.glob(os.path.join(conftest.ROOT, "Testbilder", "*"))):
+        name = os.path.basename(path)
+        for mode, settings in PHOTO_MODES.items():
+            result[f"{name}-{mode}"] = (
+                lambda path=path: CropperTool.read_image(path),
+                {**PHOTO_SETTINGS.get(name, {}), **settings})
+    for name, (factory, boardSettings) in boards.SYNTHETIC.items():
+        for mode, settings in SYNTHETIC_MODES.items():
+            result[f"{name}-{mode}"] = (factory, {**boardSettings, **settings})
+    return result
+
+
+def cutout_hash(cutout:np.array)->list:
+    """shape and sha1 of the pixels of a cutout"""
+    cutout = np.ascontiguousarray(cutout)
+    return [list(cutout.shape), hashlib.sha1(cutout.tobytes()).hexdigest()]
+
+
+def follows_grid(cutout:np.array)->bool:
+    """
+    check that a cutout is one cell of the drawn grid: a drawn line along
+    every side and none across the cell
+
+    Parameters
+    ----------
+    cutout : np.array
+        BGR cutout
+
+    Returns
+    -------
+    bool
+        True if the cutout lies between the lines of one cell
+    """
+    dark = cutout.max(axis=2) < 100
+    height, width = dark.shape
+    dy = max(int(BORDER_RATIO*height), 1)
+    dx = max(int(BORDER_RATIO*width), 1)
+    rows, columns = dark.mean(axis=1), dark.mean(axis=0)
+    inside = max(rows[dy:height-dy].max(), columns[dx:width-dx].max())
+    sides = min(rows[:dy].max(), rows[height-dy:].max(),
+                columns[:dx].max(), columns[width-dx:].max())
+    return inside < LINE_RATIO and sides >= BORDER_LINE_RATIO
+
+
+def run_case(factory, settings:dict)->tuple:
+    """
+    run the pipeline and record the results of its stages
+
+    Parameters
+    ----------
+    factory : callable
+        returns the image
+    settings : dict
+        pipeline settings
+
+    Returns
+    -------
+    tuple
+        record: status, error, dots (of every call of find_red_dots),
+        corners (of the photo and of the warped image) and the boards with
+        their rectangles and cutout hashes
+        result: result of CropperTool.seperate_image
+    """
+    record = {'dots': [], 'corners': [], 'warped_corners': []}
+    find_red_dots = CropperTool.find_red_dots
+    warp_perspektive = CropperTool.warp_perspektive
+    find_rectangles = ShapeAnalysis.Grid.find_rectangles
+
+    def spy_dots(*args, **kwargs):
+        points = find_red_dots(*args, **kwargs)
+        record['dots'].append(points.points.tolist())
+        return points
+
+    def spy_warp(img, corners):
+        record['corners'].append({key: corners[key].tolist() for key in 'ABCD'})
+        return warp_perspektive(img, corners)
+
+    def spy_rectangles(grid):
+        record['warped_corners'].append(
+            {key: grid.corners[key].tolist() for key in 'ABCD'})
+        return find_rectangles(grid)
+
+    # one board after another, so the recorded order is fixed
+    settings = {'output_dir': None, 'threads': 1, **settings}
+    with mock.patch.object(CropperTool, 'find_red_dots', spy_dots), \
+            mock.patch.object(CropperTool, 'warp_perspektive', spy_warp), \
+            mock.patch.object(ShapeAnalysis.Grid, 'find_rectangles',
+                              spy_rectangles), \
+            contextlib.redirect_stdout(io.StringIO()):
+        result = CropperTool.seperate_image(factory(), settings)
+    record['status'] = result['status']
+    record['error'] = result['error']
+    record['boards'] = [
+        {'status': board['status'], 'error': board['error'],
+         'passed': board['quality'] and board['quality']['passed'],
+         'rectangles': board['rectangles'],
+         'cutouts': [cutout_hash(cutout) for cutout in board['cutouts']]}
+        for board in result.get('boards', [result])]
+    return record, result
+
+
+def versions()->dict:
+    """versions that the cutout pixels depend on"""
+    return {'opencv': CropperTool.cv2.__version__, 'numpy': np.__version__}
+
+
+def write_golden():
+    """run all cases and write the golden file"""
+    golden = {**versions(), 'cases': {
+        name: run_case(factory, settings)[0]
+        for name, (factory, settings) in cases().items()}}
+    os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+    with open(GOLDEN_PATH, 'w', encoding='utf-8') as file:
+        json.dump(golden, file, indent=1, sort_keys=True)
+        file.write('\n')
+    statuses = [case['status'] for case in golden['cases'].values()]
+    print(f"{len(statuses)} cases written to {GOLDEN_PATH}: " + ', '.join(
+        f"{statuses.count(s)} {s}" for s in ('ok', 'rejected', 'error')))
+
+
+def assert_points_equal(actual, expected, what:str):
+    assert len(actual) == len(expected), what
+    if len(expected):
+        np.testing.assert_allclose(
+            np.asarray(actual, np.float64), np.asarray(expected, np.float64),
+            atol=ATOL, err_msg=what)
+
+
+def assert_corners_equal(actual:list, expected:list, what:str):
+    assert len(actual) == len(expected), what
+    for i, (a, e) in enumerate(zip(actual, expected)):
+        for key in 'ABCD':
+            assert_points_equal(a[key], e[key], f"{what} {i} {key}")
+
+# =========================================================================== #
+#  SECTION: Tests
+# =========================================================================== #
+@pytest.fixture(scope='module')
+def golden()->dict:
+    if not os.path.exists(GOLDEN_PATH):
+        pytest.fail(f"{GOLDEN_PATH} is missing, run python tests/test_golden.py")
+    with open(GOLDEN_PATH, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def test_all_cases_are_pinned(golden):
+    assert sorted(golden['cases']) == sorted(cases()), \
+        "the cases changed, run python tests/test_golden.py"
+
+
+def test_follows_grid():
+    # the first cell of the default board spans x 300-480 and y 250-500
+    img = boards.draw_board()
+    assert follows_grid(img[248:503, 298:483])
+    # two cells, a shifted cell and the inside of a cell
+    assert not follows_grid(img[248:503, 298:663])
+    assert not follows_grid(img[248:503, 388:573])
+    assert not follows_grid(img[270:480, 320:460])
+
+
+@pytest.mark.parametrize('name', sorted(cases()))
+def test_golden_output(name, golden):
+    if name not in golden['cases']:
+        pytest.fail(f"{name} is not pinned, run python tests/test_golden.py")
+    factory, settings = cases()[name]
+    expected = golden['cases'][name]
+    actual, result = run_case(factory, settings)
+    assert actual['status'] == expected['status']
+    assert actual['error'] == expected['error']
+    assert len(actual['dots']) == len(expected['dots'])
+    for i, (a, e) in enumerate(zip(actual['dots'], expected['dots'])):
+        assert_points_equal(a, e, f"dots of call {i}")
+    assert_corners_equal(actual['corners'], expected['corners'], "corners")
+    assert_corners_equal(actual['warped_corners'], expected['warped_corners'],
+                         "warped corners")
+    assert len(actual['boards']) == len(expected['boards'])
+    # the pixels depend on the decoder and interpolation of the cv2 build
+    same_build = versions() == {key: golden[key] for key in versions()}
+    for i, (a, e) in enumerate(zip(actual['boards'], expected['boards'])):
+        assert (a['status'], a['error'], a['passed']) \
+            == (e['status'], e['error'], e['passed']), f"board {i}"
+        assert_points_equal(np.reshape(a['rectangles'], (-1, 2)),
+                            np.reshape(e['rectangles'], (-1, 2)),
+                            f"rectangles of board {i}")
+        assert [c[0] for c in a['cutouts']] == [c[0] for c in e['cutouts']], \
+            f"cutout shapes of board {i}"
+        if same_build:
+            assert [c[1] for c in a['cutouts']] == [c[1] for c in e['cutouts']], \
+                f"cutout pixels of board {i}"
+    settings = {**CropperTool.DEFAULT_SETTINGS, **settings}
+    for i, board in enumerate(result.get('boards', [result])):
+        if board['status'] != 'ok':
+            continue
+        assert len(board['cutouts']) == settings['columns']*settings['rows']
+        for key, cutout in enumerate(board['cutouts']):
+            assert follows_grid(cutout), \
+                f"cutout {key} of board {i} crosses the drawn grid"
+
+# =========================================================================== #
+#  SECTION: Main Body
+# =========================================================================== #
+
+if __name__ == '__main__':
+    write_golden()
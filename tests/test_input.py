@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+the input adapters of CropperTool: file paths, encoded images in memory,
+decoded arrays and the memory-mapped sources of the memory bounded mode
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import contextlib
+import io
+import mmap
+
+import cv2
+import numpy as np
+import pytest
+
+import boards
+import CropperTool
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def seperate(source, **settings)->dict:
+    settings = {'output_dir': None, 'threads': 1, **settings}
+    with contextlib.redirect_stdout(io.StringIO()):
+        return CropperTool.seperate_the_objects(source, settings)
+
+# =========================================================================== #
+#  SECTION: Tests
+# =========================================================================== #
+@pytest.fixture(scope='module')
+def board()->np.array:
+    return boards.draw_board()
+
+
+@pytest.fixture()
+def png(tmp_path, board)->str:
+    path = str(tmp_path/"board.png")
+    cv2.imwrite(path, board)
+    return path
+
+
+def test_every_source_gives_the_same_image(png, board):
+    data = open(png, 'rb').read()
+    with open(png, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        sources = [png, data, bytearray(data), memoryview(data), mapped,
+                   np.frombuffer(data, np.uint8), board,
+                   cv2.cvtColor(board, cv2.COLOR_BGR2BGRA)]
+        for source in sources:
+            np.testing.assert_array_equal(CropperTool.load_image(source), board)
+    np.testing.assert_array_equal(CropperTool.read_mapped_image(png), board)
+    # a decoded BGR image is used as it is
+    assert CropperTool.load_image(board) is board
+
+
+def test_grayscale_image():
+    gray = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    image = CropperTool.load_image(gray)
+    assert image.shape == (3, 4, 3)
+    for channel in range(3):
+        np.testing.assert_array_equal(image[:, :, channel], gray)
+
+
+def test_undecodable_sources(tmp_path):
+    empty = tmp_path/"empty.png"
+    empty.write_bytes(b'')
+    assert CropperTool.load_image(b'no image') is None
+    assert CropperTool.load_image(b'') is None
+    assert CropperTool.read_mapped_image(str(empty)) is None
+    assert CropperTool.load_image(str(tmp_path/"missing.png")) is None
+
+
+def test_unsupported_sources():
+    with pytest.raises(ValueError):
+        CropperTool.load_image(np.zeros((4, 4, 2), np.uint8))
+    with pytest.raises(TypeError):
+        CropperTool.load_image(42)
+
+
+def test_memory_mapped_sources(tmp_path, board):
+    npy, raw = str(tmp_path/"board.npy"), str(tmp_path/"board.raw")
+    np.save(npy, board)
+    board.tofile(raw)
+    source = CropperTool.open_source(npy)
+    assert isinstance(source, np.memmap)
+    np.testing.assert_array_equal(source, board)
+    source = CropperTool.open_source(raw, board.shape[:2])
+    assert isinstance(source, np.memmap)
+    np.testing.assert_array_equal(source, board)
+    with pytest.raises(ValueError, match='raw_shape'):
+        CropperTool.open_source(raw)
+    np.save(npy, board.astype(np.float32))
+    with pytest.raises(ValueError, match='8 bit BGR'):
+        CropperTool.open_source(npy)
+
+
+def test_sources_give_the_same_cutouts(png, tmp_path, board):
+    expected = seperate(png)
+    assert expected['status'] == 'ok' and expected['file'] == png
+    np.save(str(tmp_path/"board.npy"), board)
+    for source in (open(png, 'rb').read(), board, str(tmp_path/"board.npy")):
+        result = seperate(source)
+        assert result['status'] == 'ok'
+        assert len(result['cutouts']) == len(expected['cutouts'])
+        for a, e in zip(result['cutouts'], expected['cutouts']):
+            np.testing.assert_array_equal(a, e)
+
+
+def test_source_errors_are_results(tmp_path):
+    (tmp_path/"board.raw").write_bytes(b'\0'*30)
+    # a .raw file without raw_shape and a file that can not be decoded
+    for source in (str(tmp_path/"board.raw"), b'no image'):
+        result = seperate(source)
+        assert result['status'] == 'error' and result['error']
+        assert result['cutouts'] == []
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+memory bounded mode (max_memory) on a memory-mapped 6000x4000 scan, as
+.npy and .raw file and from the command line, and on a board photographed
+in perspective
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import contextlib
+import io
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+import boards
+import BatchRunner
+import CropperTool
+import test_golden
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+@pytest.fixture(scope='module')
+def scan(tmp_path_factory)->str:
+    """6000x4000 board as .npy file"""
+    path = tmp_path_factory.mktemp('large')/"scan.npy"
+    np.save(path, boards.draw_board(size=(6000, 4000)))
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def photo(tmp_path_factory)->str:
+    """6000x4000 board photographed in perspective as .npy file"""
+    img = boards.draw_board(size=(6000, 4000))
+    H = cv2.getPerspectiveTransform(
+        np.float32([[0, 0], [6000, 0], [6000, 4000], [0, 4000]]),
+        np.float32([[400, 300], [5600, 0], [6000, 4000], [0, 3700]]))
+    path = tmp_path_factory.mktemp('large')/"photo.npy"
+    np.save(path, cv2.warpPerspective(img, H, (6000, 4000),
+                                      borderValue=(60, 110, 160)))
+    return str(path)
+
+
+def run(source, **settings)->dict:
+    settings = {'output_dir': None, 'threads': 1, **settings}
+    with contextlib.redirect_stdout(io.StringIO()):
+        return CropperTool.seperate_the_objects(source, settings)
+
+
+@pytest.fixture
+def budgets(monkeypatch)->list:
+    """all MemoryBudgets of the test"""
+    created = list()
+
+    class RecordedBudget(CropperTool.MemoryBudget):
+        def __init__(self, limit):
+            super().__init__(limit)
+            created.append(self)
+
+    monkeypatch.setattr(CropperTool, 'MemoryBudget', RecordedBudget)
+    return created
+
+# =========================================================================== #
+#  SECTION: Tests
+# =========================================================================== #
+@pytest.mark.parametrize('cell_threads', [1, 4])
+def test_tiles_share_the_memory_limit(scan, budgets, cell_threads):
+    result = run(scan, max_memory=10, cell_threads=cell_threads)
+    assert result['status'] == 'ok', result['error']
+    assert len(result['cutouts']) == 10
+    budget, = budgets
+    # the proxy is counted, the tiles of all threads together fit the rest
+    assert budget.limit == 10*2**20 - 1500*1000*3
+    assert 0 < budget.peak <= budget.limit
+    assert budget.used == 0
+    # the drawn cells of 720x1000 pixels in full resolution
+    for cutout in result['cutouts']:
+        assert abs(cutout.shape[1] - 720) <= 3
+        assert abs(cutout.shape[0] - 1000) <= 3
+
+
+def test_cutouts_do_not_depend_on_the_limit(scan):
+    bounded = run(scan, max_memory=10, cell_threads=4)
+    unbounded = run(scan, max_memory=1000)
+    assert bounded['status'] == unbounded['status'] == 'ok'
+    for a, b in zip(bounded['cutouts'], unbounded['cutouts']):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_too_large_tile(scan):
+    result = run(scan, max_memory=5)
+    assert result['status'] == 'error'
+    assert "tile of rectangle 0 needs" in result['error']
+
+
+def test_raw_scan(scan, tmp_path):
+    raw = str(tmp_path/"scan.raw")
+    np.load(scan, mmap_mode='r').tofile(raw)
+    expected = run(scan, max_memory=10)
+    result = run(raw, max_memory=10, raw_shape=(4000, 6000))
+    assert result['status'] == 'ok', result['error']
+    for a, b in zip(result['cutouts'], expected['cutouts']):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_command_line(scan, tmp_path, budgets):
+    with contextlib.redirect_stdout(io.StringIO()):
+        result, = BatchRunner.main([scan, '-o', str(tmp_path/"out"), '-j', '1',
+                                    '--max-memory', '10'])
+    assert result['status'] == 'ok', result['error']
+    budget, = budgets
+    assert budget.limit == 10*2**20 - 1500*1000*3
+    assert sorted((tmp_path/"out"/"scan").iterdir()) \
+        == sorted(tmp_path/"out"/"scan"/f"roi{i}.jpg" for i in range(10))
+
+
+def test_cells_are_warped_like_in_the_normal_mode(photo):
+    bounded = run(photo, max_memory=20)
+    normal = run(np.load(photo))
+    assert bounded['status'] == normal['status'] == 'ok'
+    for a, b in zip(bounded['cutouts'], normal['cutouts']):
+        # upright and in full resolution, the normal cells are stretched to
+        # the 1500x1000 warped image
+        assert test_golden.follows_grid(a)
+        assert a.shape[0] > 1.5*b.shape[0] and a.shape[1] > 1.5*b.shape[1]
+        a = cv2.resize(a, b.shape[1::-1], interpolation=cv2.INTER_AREA)
+        assert np.abs(a.astype(int) - b).mean() < 5
+
+
+def test_decoded_formats_are_rejected(tmp_path):
+    path = str(tmp_path/"board.png")
+    cv2.imwrite(path, boards.draw_board())
+    result = run(path, max_memory=100)
+    assert result['status'] == 'error' and ".npy or .raw" in result['error']
+    # a decoded image is used as it is
+    assert run(boards.draw_board(), max_memory=100)['status'] == 'ok'
+
+
+def test_limit_smaller_than_the_proxy(scan):
+    result = run(scan, max_memory=4)
+    assert result['status'] == 'error'
+    assert "proxy" in result['error']
+
+
+def test_budget_waits_for_free_bytes():
+    budget = CropperTool.MemoryBudget(10)
+    reserved = threading.Event()
+
+    def second():
+        with budget.reserve(6):
+            reserved.set()
+
+    with budget.reserve(6):
+        thread = threading.Thread(target=second)
+        thread.start()
+        assert not reserved.wait(0.05)
+    thread.join(5)
+    assert reserved.is_set()
+    with pytest.raises(ValueError):
+        with budget.reserve(11):
+            pass
+    assert budget.used == 0 and budget.peak == 6
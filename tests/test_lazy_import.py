@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LazyImport: the heavy modules are imported on their first use, also if many
+threads use them for the first time at once
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import os
+import subprocess
+import sys
+
+import pytest
+
+import conftest
+import LazyImport
+# =========================================================================== #
+#  SECTION: Global definitions
+# =========================================================================== #
+BENCHMARKS = os.path.join(conftest.ROOT, 'benchmarks')
+
+# =========================================================================== #
+#  SECTION: Tests
+# =========================================================================== #
+def test_concurrent_first_use():
+    check = subprocess.run(
+        [sys.executable, os.path.join(BENCHMARKS, 'bench_import_threads.py'),
+         '-r', '3'], capture_output=True, text=True, timeout=300)
+    assert check.returncode == 0, check.stdout + check.stderr
+
+
+def test_geometry_does_not_load_heavy_modules():
+    check = subprocess.run(
+        [sys.executable, os.path.join(BENCHMARKS, 'bench_import.py'),
+         '-r', '1'], capture_output=True, text=True, timeout=300)
+    assert check.returncode == 0, check.stdout + check.stderr
+
+
+def test_lazy_module_is_not_registered_before_its_use():
+    probe = ("import sys, LazyImport\n"
+             "json = LazyImport.lazy_import('json')\n"
+             "assert 'json' not in sys.modules\n"
+             "assert json.dumps([1]) == '[1]'\n"
+             "assert sys.modules['json'] is not json\n"
+             "assert json.loads is sys.modules['json'].loads\n")
+    subprocess.run([sys.executable, '-c', probe], cwd=conftest.ROOT,
+                   check=True, timeout=60)
+
+
+def test_missing_module():
+    with pytest.raises(ModuleNotFoundError):
+        LazyImport.lazy_import('no_such_module_here')
+    assert LazyImport.lazy_import('os') is os
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+the metrics registry of Metrics: counters, histograms, the merge of worker
+snapshots and the Prometheus and JSON exports
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import json
+import os
+
+import pytest
+
+import Metrics
+# =========================================================================== #
+#  SECTION: Tests
+# =========================================================================== #
+@pytest.fixture()
+def registry():
+    """fresh registry of the module, the old one is restored afterwards"""
+    previous = Metrics.get_registry()
+    registry = Metrics.Registry()
+    Metrics.set_registry(registry)
+    yield registry
+    Metrics.set_registry(previous)
+
+
+def test_counters_and_histograms(registry):
+    Metrics.inc('images_total', status='ok')
+    Metrics.inc('images_total', 2, status='ok')
+    Metrics.inc('images_total', status='error')
+    for value in (0.0005, 0.003, 0.003, 20):
+        Metrics.observe('image_seconds', value)
+    snapshot = registry.snapshot()
+    counters = {c['labels']['status']: c['value'] for c in snapshot['counters']}
+    assert counters == {'ok': 3, 'error': 1}
+    histogram, = snapshot['histograms']
+    assert histogram['buckets'] == list(Metrics.LATENCY_BUCKETS)
+    # per bucket, the last one is +Inf
+    assert histogram['counts'] == [1, 0, 2] + [0]*10 + [1]
+    assert histogram['count'] == 4
+    assert histogram['sum'] == pytest.approx(20.0065)
+    json.loads(registry.to_json())
+
+
+def test_snapshot_reset(registry):
+    registry.inc('images_total')
+    registry.observe('dots', 4, Metrics.DOT_BUCKETS)
+    assert registry.snapshot(reset=True)['counters']
+    assert registry.snapshot() == {'counters': [], 'histograms': []}
+
+
+def test_merge(registry):
+    worker = Metrics.Registry()
+    worker.inc('images_total', status='ok')
+    worker.observe('image_seconds', 0.2)
+    registry.inc('images_total', status='ok')
+    registry.merge(worker.snapshot())
+    registry.merge(worker.snapshot())
+    snapshot = registry.snapshot()
+    assert snapshot['counters'][0]['value'] == 3
+    assert snapshot['histograms'][0]['count'] == 2
+    assert snapshot['histograms'][0]['sum'] == pytest.approx(0.4)
+    other = Metrics.Registry()
+    other.observe('image_seconds', 0.2, buckets=(1, 2))
+    with pytest.raises(ValueError):
+        registry.merge(other.snapshot())
+
+
+def test_prometheus_format(registry):
+    registry.inc('images_total', status='ok')
+    registry.inc('images_total', status='e"r\\r\nor')
+    registry.observe('stage_seconds', 0.2, buckets=(0.1, 1), stage='warp')
+    registry.observe('stage_seconds', 0.05, buckets=(0.1, 1), stage='warp')
+    registry.observe('stage_seconds', 3, buckets=(0.1, 1), stage='warp')
+    lines = registry.to_prometheus().splitlines()
+    assert lines == [
+        '# TYPE cropper_images_total counter',
+        'cropper_images_total{status="ok"} 1',
+        'cropper_images_total{status="e\\"r\\\\r\\nor"} 1',
+        '# TYPE cropper_stage_seconds histogram',
+        'cropper_stage_seconds_bucket{stage="warp",le="0.1"} 1',
+        'cropper_stage_seconds_bucket{stage="warp",le="1"} 2',
+        'cropper_stage_seconds_bucket{stage="warp",le="+Inf"} 3',
+        'cropper_stage_seconds_sum{stage="warp"} 3.25',
+        'cropper_stage_seconds_count{stage="warp"} 3']
+
+
+def test_null_registry(registry):
+    Metrics.set_registry(Metrics.NullRegistry())
+    Metrics.inc('images_total')
+    Metrics.observe('image_seconds', 1)
+    with Metrics.stage('load'):
+        pass
+    assert Metrics.get_registry().snapshot() \
+        == {'counters': [], 'histograms': []}
+
+
+def test_stage(registry):
+    with Metrics.stage('load'):
+        pass
+    with pytest.raises(KeyError):
+        with Metrics.stage('warp'):
+            raise KeyError('corner')
+    snapshot = registry.snapshot()
+    assert snapshot['counters'] == [{'name': 'stage_failures_total',
+                                     'labels': {'stage': 'warp'}, 'value': 1}]
+    assert sorted(h['labels']['stage'] for h in snapshot['histograms']) \
+        == ['load', 'warp']
+
+
+@pytest.mark.parametrize('name', ['metrics.json', 'metrics.prom'])
+def test_file_exporter(registry, tmp_path, name):
+    path = str(tmp_path/"folder"/name)
+    exporter = Metrics.FileExporter(path, interval=3600)
+    registry.inc('images_total')
+    exporter.export()
+    registry.inc('images_total')
+    # within the interval the file is not written again
+    exporter.export()
+    first = open(path).read()
+    exporter.export(force=True)
+    second = open(path).read()
+    if name.endswith('.json'):
+        assert json.loads(first)['counters'][0]['value'] == 1
+        assert json.loads(second)['counters'][0]['value'] == 2
+    else:
+        assert 'cropper_images_total 1\n' in first
+        assert 'cropper_images_total 2\n' in second
+    # no temporary file is left
+    assert os.listdir(tmp_path/"folder") == [name]
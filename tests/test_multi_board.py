@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+several game boards in one photo (multi_board): the boards are found, sorted
+row by row from the top left and processed one by one
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import contextlib
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+import boards
+import CropperTool
+import Metrics
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def draw_papers(*boxes:tuple)->np.array:
+    """white papers (x, y, w, h) on a dark table"""
+    img = np.full((1000, 1500, 3), (40, 60, 90), np.uint8)
+    for x, y, w, h in boxes:
+        cv2.rectangle(img, (x, y), (x+w-1, y+h-1), (245, 245, 245), -1)
+    return img
+
+
+def order(img:np.array)->list:
+    """left and top of the found boards in their order"""
+    return [cv2.boundingRect(c)[:2] for c in CropperTool.find_boards(img)]
+
+# =========================================================================== #
+#  SECTION: Tests
+# =========================================================================== #
+def test_boards_are_sorted_row_by_row():
+    img = draw_papers((800, 100, 500, 300), (100, 120, 500, 300),
+                      (850, 550, 500, 300), (50, 520, 500, 300))
+    lefts = [x for x, y in order(img)]
+    assert lefts[0] < lefts[1] and lefts[2] < lefts[3]
+    assert lefts[0] < 200 and lefts[2] < 200
+
+
+@pytest.mark.parametrize('offset', range(-8, 9, 2))
+def test_boards_side_by_side_stay_in_one_row(offset):
+    # the centers are around 1.5 board heights, where rounding the center
+    # to a row flips
+    img = draw_papers((800, 286, 500, 300), (100, 288+offset, 500, 300))
+    lefts = [x for x, y in order(img)]
+    assert lefts[0] < lefts[1]
+
+
+def test_small_contours_and_the_largest_board():
+    img = draw_papers((100, 100, 600, 400), (800, 100, 500, 350),
+                      (800, 700, 100, 100))
+    assert len(CropperTool.find_boards(img)) == 2
+    largest, = CropperTool.find_boards(img, all_boards=False)
+    assert cv2.boundingRect(largest)[0] < 200
+
+
+def test_every_board_is_processed(tmp_path):
+    registry = Metrics.Registry()
+    previous = Metrics.get_registry()
+    Metrics.set_registry(registry)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = CropperTool.seperate_image(
+                boards.draw_boards(), {'multi_board': True, 'threads': 2,
+                                       'output_dir': str(tmp_path)})
+    finally:
+        Metrics.set_registry(previous)
+    assert result['status'] == 'ok', result['error']
+    assert [board['status'] for board in result['boards']] == ['ok', 'ok']
+    assert result['boards'][0]['box'][0] < result['boards'][1]['box'][0]
+    for index in range(2):
+        assert len(list((tmp_path/f"board{index}").iterdir())) == 10
+    # the dots are counted once per board
+    histogram, = [h for h in registry.snapshot()['histograms']
+                  if h['name'] == 'dots_per_board']
+    assert histogram['count'] == 2 and histogram['sum'] == 8
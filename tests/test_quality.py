@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+the geometry quality gate of CropperTool (check_cutouts) on regular and
+distorted lattices
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import json
+
+import numpy as np
+import pytest
+
+import CropperTool
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def cell(x:float, y:float, width:float, height:float, shear:float=0)->list:
+    """corners of one cell in the order of Grid.find_rectangles: bottom
+    right, top right, top left, bottom left. The bottom edge is shifted by
+    shear, so the area stays the same."""
+    return [[x+width+shear, y+height], [x+width, y], [x, y],
+            [x+shear, y+height]]
+
+
+def lattice(widths:list, heights:list, shear:float=0)->np.array:
+    """(n, 4, 2) cells of columns with the given widths and rows with the
+    given heights"""
+    xs, ys = np.cumsum([0, *widths]), np.cumsum([0, *heights])
+    return np.array([cell(xs[i], ys[j], w, h, shear)
+                     for j, h in enumerate(heights)
+                     for i, w in enumerate(widths)], np.float64)
+
+# =========================================================================== #
+#  SECTION: Tests
+# =========================================================================== #
+def test_regular_lattice_passes():
+    quality = CropperTool.check_cutouts(lattice([180]*5, [250]*2))
+    assert quality['passed'] and quality['reasons'] == []
+    assert quality['area_std'] == pytest.approx(0)
+    assert quality['aspect_std'] == pytest.approx(0)
+    assert quality['angle_error'] == pytest.approx(0)
+    # the dict format of the original implementation
+    cells = lattice([180]*5, [250]*2)
+    assert CropperTool.check_cutouts(dict(enumerate(cells.tolist()))) \
+        == quality
+
+
+@pytest.mark.parametrize('widths, heights, shear, failed', [
+    # one column twice as wide: other area and aspect ratio
+    ([180, 180, 180, 180, 360], [250, 250], 0, ['area', 'aspect ratio']),
+    # all cells sheared by 60 px: only the corner angles fail
+    ([180]*5, [250, 250], 60, ['corner angle']),
+    # slightly uneven cells stay below the limits
+    ([180, 175, 185, 180, 182], [250, 245], 5, []),
+])
+def test_limits(widths, heights, shear, failed):
+    quality = CropperTool.check_cutouts(lattice(widths, heights, shear))
+    assert [reason.split(' deviation')[0] for reason in quality['reasons']] \
+        == failed
+    assert quality['passed'] == (not failed)
+
+
+def test_aspect_ratio_limit():
+    # equal areas, but square cells next to flat ones
+    cells = np.array([cell(0, 0, 200, 200), cell(200, 0, 200, 200),
+                      cell(400, 0, 400, 100), cell(400, 100, 400, 100)])
+    quality = CropperTool.check_cutouts(cells)
+    assert quality['area_std'] == pytest.approx(0)
+    assert quality['aspect_std'] > CropperTool.MAX_ASPECT_DEVIATION
+    assert quality['reasons'] == ['aspect ratio deviation of {:.2f} %'.format(
+        quality['aspect_std'])]
+
+
+def test_limits_are_the_thresholds():
+    # two cells with an area deviation of 8.3 % and 11.1 %
+    for factor, passed in ((1.18, True), (1.25, False)):
+        quality = CropperTool.check_cutouts(lattice([180, 180*factor], [250]))
+        areaFailed = any(r.startswith('area') for r in quality['reasons'])
+        assert areaFailed != passed
+    # shear of a corner angle just below and above 10 degree
+    for angle, passed in ((9.5, True), (10.5, False)):
+        shear = 250*np.tan(np.radians(angle))
+        quality = CropperTool.check_cutouts(lattice([180]*3, [250], shear))
+        assert quality['angle_error'] == pytest.approx(angle)
+        assert quality['passed'] == passed
+
+
+def test_degenerated_cells_are_valid_json():
+    cells = lattice([180]*5, [250]*2)
+    # all corners of one cell on the same point
+    cells[3] = cells[3][0]
+    quality = CropperTool.check_cutouts(cells)
+    assert not quality['passed']
+    assert quality['angle_error'] is None
+    json.dumps(quality, allow_nan=False)
+    assert CropperTool.check_cutouts([])['reasons'] == ['no rectangles found']
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+remap setting: the cells are cut from the photo without the warped image
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import contextlib
+import io
+import os
+from unittest import mock
+
+import numpy as np
+import pytest
+
+import conftest
+import boards
+import CropperTool
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def run(img, **settings)->dict:
+    settings = {'output_dir': None, 'threads': 1, 'adaptive': True, **settings}
+    with contextlib.redirect_stdout(io.StringIO()):
+        return CropperTool.seperate_image(img, settings)
+
+# =========================================================================== #
+#  SECTION: Tests
+# =========================================================================== #
+def test_remap_does_not_warp():
+    with mock.patch.object(CropperTool, 'find_red_dots',
+                           wraps=CropperTool.find_red_dots) as dots, \
+            mock.patch.object(CropperTool, 'warp_perspektive') as warp:
+        result = run(boards.draw_board(size=(3000, 2000)), remap=True)
+    assert result['status'] == 'ok'
+    assert dots.call_count == 1
+    warp.assert_not_called()
+    # the drawn cells of 360x500 pixels, upright
+    assert [cutout.shape for cutout in result['cutouts']] == [(500, 360, 3)]*10
+
+
+def test_remap_rectangles_match_the_warped_image():
+    img = boards.draw_board()
+    remapped, warped = run(img, remap=True), run(img)
+    # the lattice of the corners equals the one of the dots found again
+    np.testing.assert_allclose(remapped['rectangles'], warped['rectangles'],
+                               atol=2)
+
+
+def test_warped_corners():
+    corners = {'A': np.float32([300, 250]), 'B': np.float32([310, 760]),
+               'C': np.float32([1220, 740]), 'D': np.float32([1190, 240])}
+    warped = CropperTool.warped_corners(corners)
+    M, (width, height) = CropperTool.perspective_transform(corners)
+    sx, sy = 1500/width, 1000/height
+    # the orientation of the photo is kept
+    expected = {'A': [10*sx, 10*sy], 'B': [10*sx, (height-10)*sy],
+                'C': [(width-10)*sx, (height-10)*sy], 'D': [(width-10)*sx, 10*sy]}
+    for key in 'ABCD':
+        np.testing.assert_allclose(warped[key], expected[key], atol=1e-3)
+
+
+@pytest.mark.parametrize('name', ['photo_test6.jpg', 'test7.png'])
+def test_dots_off_the_lattice_are_rejected(name):
+    # a dot at every knot, Grid takes four of them as the corners
+    img = CropperTool.read_image(os.path.join(conftest.ROOT, "Testbilder", name))
+    columns = 4 if name == 'test7.png' else 5
+    result = run(img, remap=True, columns=columns)
+    assert result['status'] == 'rejected'
+    assert result['quality']['dot_error'] > CropperTool.MAX_DOT_DEVIATION
+    assert result['cutouts'] == []
+
+
+def test_dots_on_the_lattice_pass():
+    result = run(boards.draw_board(), remap=True)
+    assert result['quality']['passed']
+    assert result['quality']['dot_error'] <= 2
+
+
+def test_too_large_cells():
+    result = run(boards.draw_board(), remap=True, cell_size=(5000, 5000))
+    assert result['status'] == 'error'
+    assert "much larger than the image" in result['error']
+
+
+def test_memory_bounded_remap(tmp_path, monkeypatch):
+    path = str(tmp_path/"scan.npy")
+    np.save(path, boards.draw_board(size=(6000, 4000)))
+    budgets = list()
+
+    class RecordedBudget(CropperTool.MemoryBudget):
+        def __init__(self, limit):
+            super().__init__(limit)
+            budgets.append(self)
+
+    monkeypatch.setattr(CropperTool, 'MemoryBudget', RecordedBudget)
+    # the remap table of all cells is never built
+    monkeypatch.setattr(CropperTool, 'build_remap', None)
+    settings = {'output_dir': None, 'threads': 1, 'adaptive': True,
+                'remap': True, 'cell_threads': 4}
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = CropperTool.seperate_the_objects(
+            path, {**settings, 'max_memory': 10})
+        small = CropperTool.seperate_the_objects(
+            path, {**settings, 'max_memory': 5})
+    assert result['status'] == 'ok', result['error']
+    for cutout in result['cutouts']:
+        assert abs(cutout.shape[1] - 720) <= 3
+        assert abs(cutout.shape[0] - 1000) <= 3
+    budget = budgets[0]
+    assert 0 < budget.peak <= budget.limit and budget.used == 0
+    assert small['status'] == 'error'
+    assert "tile of rectangle 0 needs" in small['error']
+
+
+def test_memory_bounded_remap_matches_the_table():
+    source = boards.draw_board(size=(3000, 2000))
+    corners = {'A': np.float32([300.5, 250.2]), 'B': np.float32([300.2, 750.4]),
+               'C': np.float32([1200.3, 750.1]), 'D': np.float32([1199.6, 249.7])}
+    grid = CropperTool.ShapeAnalysis.Grid(
+        [corners[key] for key in 'ABCD'], subpixel=True)
+    grid.set_corners(CropperTool.warped_corners(corners))
+    rectangles = grid.find_rectangles()
+    settings = {**CropperTool.DEFAULT_SETTINGS, 'output_dir': None,
+                'remap': True}
+    table = CropperTool.remap_board(source, corners, rectangles, settings)
+    tiles = CropperTool.remap_board(source, corners, rectangles,
+                                    {**settings, 'max_memory': 100})
+    for a, b in zip(table, tiles):
+        assert a.shape == b.shape
+        # only the rounding of the fixed point maps differs
+        difference = np.abs(a.astype(int) - b)
+        assert difference.max() <= 8 and (difference > 0).mean() < 0.02
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+the worker mode of CropperService: one JSON request per line, one JSON
+response per line, a bad request must not stop the worker
+"""
+# =========================================================================== #
+#  SECTION: Imports
+# =========================================================================== #
+import base64
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+
+import cv2
+import pytest
+
+import conftest
+import boards
+import CropperService
+# =========================================================================== #
+#  SECTION: Function definitions
+# =========================================================================== #
+def serve(*lines:str)->list:
+    """answers of the worker to the request lines"""
+    outstream = io.StringIO()
+    with contextlib.redirect_stderr(io.StringIO()):
+        CropperService.serve(io.StringIO(''.join(l + '\n' for l in lines)),
+                             outstream)
+    return [json.loads(line) for line in outstream.getvalue().splitlines()]
+
+
+def board_request(**request)->str:
+    image = base64.b64encode(cv2.imencode('.png', boards.draw_board())[1])
+    return json.dumps({'image': image.decode('ascii'), **request})
+
+# =========================================================================== #
+#  SECTION: Tests
+# =========================================================================== #
+@pytest.mark.parametrize('line', [
+    '[1]', '"x"', '3', 'null', '{bad json', '{"id": 1, "settings": []}',
+    '{"id": 1, "settings": {"unknown": 1}}', '{"id": 1}',
+    '{"id": 1, "path": "missing.png"}'])
+def test_bad_request_is_answered_with_an_error(line):
+    # the worker keeps running and answers the next request
+    responses = serve(line, board_request(id=2))
+    assert len(responses) == 2
+    assert responses[0]['status'] == 'error' and responses[0]['error']
+    assert responses[0]['id'] == (1 if '"id": 1' in line else None)
+    assert responses[1]['id'] == 2 and responses[1]['status'] == 'ok'
+
+
+def test_cutouts_are_returned():
+    response, = serve(board_request(id='a', **{'return': 'cutouts'}))
+    assert response['id'] == 'a' and response['status'] == 'ok'
+    assert len(response['cutouts']) == 10
+    cutout = cv2.imdecode(
+        CropperService.CropperTool.np.frombuffer(
+            base64.b64decode(response['cutouts'][0]), 'uint8'),
+        cv2.IMREAD_COLOR)
+    assert cutout is not None and cutout.size
+
+
+def test_metrics_request():
+    responses = serve(board_request(id=1), '[1]', '{"metrics": true}')
+    counters = {(c['name'], tuple(sorted(c['labels'].items()))): c['value']
+                for c in responses[-1]['counters']}
+    assert counters[('images_total', (('status', 'ok'),))] == 1
+    assert counters[('requests_failed_total', ())] == 1
+
+
+def test_worker_process_survives_non_object_request():
+    worker = subprocess.run(
+        [sys.executable, os.path.join(conftest.ROOT, 'CropperTool.py'),
+         '--serve'], input='[1]\n"x"\n', capture_output=True, text=True,
+        timeout=120)
+    assert worker.returncode == 0, worker.stderr
+    assert [json.loads(line)['status'] for line in worker.stdout.splitlines()] \
+        == ['error', 'error']
+
+
+def test_undefined_quality_stats_are_valid_json(monkeypatch):
+    # every cell of the board without area
+    check_cutouts = CropperService.CropperTool.check_cutouts
+    monkeypatch.setattr(CropperService.CropperTool, 'check_cutouts',
+                        lambda rectangles: check_cutouts(0*rectangles))
+    outstream = io.StringIO()
+    with contextlib.redirect_stderr(io.StringIO()):
+        CropperService.serve(io.StringIO(board_request(id=1) + '\n'),
+                             outstream)
+
+    def reject(constant):
+        raise ValueError(f"{constant} is not valid JSON")
+
+    response = json.loads(outstream.getvalue(), parse_constant=reject)
+    assert response['status'] == 'rejected'
+    assert response['quality']['angle_error'] is None